@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import random
+import logging
+from typing import Any, Optional
+
+from .config import env_int
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class LazyPayload:
+    """Defer serializing (and truncating) a log payload until it is emitted.
+
+    Pass as a ``%s`` argument so that disabled or filtered log calls never pay
+    for ``json.dumps`` of large prompts and completions.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else json.dumps(self.value, default=str)
+        limit = self.max_chars if self.max_chars is not None else env_int("LOG_PAYLOAD_MAX_CHARS", 2000)
+        if limit and len(text) > limit:
+            return f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+        return text
+
+
+class PayloadSamplingFilter(logging.Filter):
+    """Only let a fraction of records marked ``extra={"payload": True}`` through."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "payload", False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra=`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key != "payload":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging() -> None:
+    """Configure root logging from the environment.
+
+    LOG_LEVEL sets the root level, LOG_LEVELS overrides individual loggers
+    (``app.services.recipe_service=DEBUG,httpx=WARNING``), LOG_FORMAT picks
+    ``text`` or ``json`` output, and LOG_PAYLOAD_SAMPLE_RATE keeps only a
+    fraction of payload dumps.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "text").strip().lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    handler.addFilter(PayloadSamplingFilter(float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+
+    for override in os.getenv("LOG_LEVELS", "").split(","):
+        if "=" not in override:
+            continue
+        name, level = override.split("=", 1)
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
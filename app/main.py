@@ -1,27 +1,73 @@
-from fastapi import FastAPI, HTTPException
-from .models import RecipeRequest, RecipeResponse, FavoriteRequest, FavoriteResponse
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from .logging_config import configure_logging
+from .metrics import REGISTRY, MetricsMiddleware
+from .models import (RecipeRequest, RecipeResponse, FavoriteRequest, FavoriteResponse,
+                     BatchRecipeRequest, BatchRecipeResponse, BatchJobResponse)
 from .services.recipe_service import RecipeService
-from .services.supabase_service import SupabaseService
+from .services.supabase_service import SupabaseService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .services.recipe_cache import RecipeCache, make_cache_key
+from .services.singleflight import SingleFlight
+from .services.history_writer import HistoryWriter
+from .services.batch_service import BatchService, BatchCapacityError
+from .services.resilience import UpstreamError
+from .services.prompt_builder import PromptOptions
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import os
+import asyncio
 import logging
 import traceback
 import sys
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+import json
+import math
+from typing import AsyncIterator, Dict, Optional
 
 load_dotenv()
 
-app = FastAPI(title="PantryToPlate API")
+# Configure logging (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_PAYLOAD_* env vars)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Constructing the services is cheap: connection pools, the Supabase client and
+# background tasks are created by the app lifespan (see create_app)
 recipe_service = RecipeService()
 supabase_service = SupabaseService()
+recipe_cache = RecipeCache()
+recipe_singleflight = SingleFlight()
+history_writer = HistoryWriter(supabase_service)
+
+router = APIRouter()
+
+async def _warm_up(app: FastAPI) -> None:
+    """Create slow dependencies after the server is already accepting connections."""
+    try:
+        await supabase_service.start()
+    except Exception as e:
+        # Not fatal: the client is created on first use instead, and readiness reports it
+        app.state.warmup_error = str(e)
+        logger.error(f"Supabase warmup failed: {str(e)}")
 
-@app.get("/test-supabase/{user_id}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled upstream HTTP client once and reuse it for every request
+    await recipe_service.start()
+    await history_writer.start()
+    app.state.warmup_error = None
+    warmup = asyncio.ensure_future(_warm_up(app))
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+        # Flush queued history rows before the Supabase pool goes away
+        await batch_service.aclose()
+        await history_writer.stop()
+        await recipe_service.aclose()
+        await recipe_cache.aclose()
+        await supabase_service.aclose()
+
+@router.get("/test-supabase/{user_id}")
 async def test_supabase(user_id: str):
     """Test endpoint to verify Supabase integration"""
     try:
@@ -39,7 +85,7 @@ async def test_supabase(user_id: str):
         logger.info(f"Saved test recipe to history: {history_result}")
         
         # Get history
-        history = await supabase_service.get_recipe_history(user_id)
+        history = (await supabase_service.get_recipe_history(user_id))['items']
         logger.info(f"Retrieved recipe history: {history}")
         
         return {
@@ -52,52 +98,219 @@ async def test_supabase(user_id: str):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate-recipe", response_model=RecipeResponse)
+def _cache_key(request: RecipeRequest) -> str:
+    return make_cache_key(request.ingredients, request.dietary_restrictions,
+                          PromptOptions.from_request(request).cache_key())
+
+async def _generate_and_cache(request: RecipeRequest, cache_key: str) -> Dict:
+    # generate_recipes returns an already validated RecipeResponse dict, so a
+    # malformed completion never reaches the cache
+    result = await recipe_service.generate_recipes(
+        request.ingredients,
+        request.dietary_restrictions,
+        PromptOptions.from_request(request)
+    )
+    await recipe_cache.set(cache_key, result)
+    return result
+
+async def _generate_recipes_cached(request: RecipeRequest) -> Dict:
+    """Return recipes for a request, serving repeated pantries from the cache.
+
+    Concurrent misses for the same pantry share a single upstream call.
+    """
+    cache_key = _cache_key(request)
+    cached = await recipe_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Recipe cache hit for key: %s", cache_key)
+        return RecipeResponse.parse_obj(cached).dict()
+
+    return await recipe_singleflight.do(
+        cache_key,
+        lambda: _generate_and_cache(request, cache_key)
+    )
+
+def _save_history(request: RecipeRequest, result: Dict) -> None:
+    if not request.user_id:
+        return
+    history_data = {
+        'ingredients': request.ingredients,
+        'dietary_restrictions': request.dietary_restrictions,
+        **result
+    }
+    # Persisted in the background; failures are retried and never fail the request
+    history_writer.enqueue(request.user_id, history_data)
+
+batch_service = BatchService(_generate_recipes_cached, supabase_service)
+
+# Existing in-process counters, read only when /metrics is scraped
+REGISTRY.register_stats("pantry_recipe_cache", recipe_cache.stats)
+REGISTRY.register_stats("pantry_recipe_singleflight", recipe_singleflight.stats)
+REGISTRY.register_stats("pantry_upstream", recipe_service.guard.stats)
+REGISTRY.register_stats("pantry_models", recipe_service.router.stats)
+REGISTRY.register_stats("pantry_supabase", supabase_service.stats)
+REGISTRY.register_stats("pantry_user_cache", supabase_service.cache.stats)
+REGISTRY.register_stats("pantry_history_writer", history_writer.stats)
+REGISTRY.register_stats("pantry_batch", batch_service.stats)
+
+async def _events_from_result(result: Dict, options: PromptOptions) -> AsyncIterator[Dict]:
+    if "recipes" in options.sections:
+        for recipe in result.get('recipes', []):
+            yield {"event": "recipe", "data": recipe}
+    for section in ("meal_plan", "grocery_list"):
+        if section in options.sections:
+            yield {"event": section, "data": result.get(section)}
+    yield {"event": "done", "data": result}
+
+async def _stream_recipe_events(request: RecipeRequest) -> AsyncIterator[str]:
+    try:
+        options = PromptOptions.from_request(request)
+        cache_key = _cache_key(request)
+        cached = await recipe_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Recipe cache hit for key: %s", cache_key)
+            events = _events_from_result(cached, options)
+        else:
+            events = recipe_service.stream_recipes(request.ingredients, request.dietary_restrictions, options)
+
+        async for event in events:
+            if event["event"] == "done":
+                result = RecipeResponse.parse_obj(event["data"]).dict()
+                yield json.dumps({"event": "done", "data": result}) + "\n"
+                if cached is None:
+                    await recipe_cache.set(cache_key, result)
+                _save_history(request, result)
+            else:
+                yield json.dumps(event) + "\n"
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        logger.error(f"Error in generate_recipe_stream: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        status = e.status_code if isinstance(e, UpstreamError) else 500
+        yield json.dumps({"event": "error", "status": status, "detail": str(e)}) + "\n"
+
+def _require_api_key() -> None:
+    if not os.getenv("OPENROUTER_API_KEY"):
+        logger.error("OpenRouter API key not found in environment variables")
+        raise HTTPException(status_code=500, detail="API key not configured")
+
+def _upstream_http_error(e: UpstreamError) -> HTTPException:
+    """Map an upstream failure to 502/503/504 instead of a blanket 500."""
+    headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@router.post("/generate-recipe", response_model=RecipeResponse)
 async def generate_recipe(request: RecipeRequest):
     try:
         # Log the incoming request
-        logger.info(f"Received request with ingredients: {request.ingredients} and restrictions: {request.dietary_restrictions}")
-        
-        # Check if API key exists
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
-            logger.error("OpenRouter API key not found in environment variables")
-            raise HTTPException(status_code=500, detail="API key not configured")
+        logger.info("Received request with ingredients: %s and restrictions: %s", request.ingredients, request.dietary_restrictions)
         
-        # Generate recipes
-        result = await recipe_service.generate_recipes(
-            request.ingredients,
-            request.dietary_restrictions
-        )
+        _require_api_key()
+
+        # Generate recipes (or reuse a cached response for the same pantry)
+        result = await _generate_recipes_cached(request)
 
         # Save to history if user_id is provided
-        if request.user_id:
-            try:
-                history_data = {
-                    'ingredients': request.ingredients,
-                    'dietary_restrictions': request.dietary_restrictions,
-                    **result
-                }
-                await supabase_service.save_recipe_history(request.user_id, history_data)
-            except Exception as e:
-                logger.error(f"Failed to save recipe history: {str(e)}")
-                # Don't fail the request if history saving fails
+        _save_history(request, result)
                 
         return result
+    except UpstreamError as e:
+        logger.error(f"Upstream error in generate_recipe: {str(e)}")
+        raise _upstream_http_error(e)
     except Exception as e:
         logger.error(f"Error in generate_recipe: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/recipe-history/{user_id}")
-async def get_recipe_history(user_id: str):
+@router.post("/generate-recipe/stream")
+async def generate_recipe_stream(request: RecipeRequest):
+    """Stream recipes as newline-delimited JSON events as soon as each one is generated"""
+    logger.info("Received streaming request with ingredients: %s and restrictions: %s", request.ingredients, request.dietary_restrictions)
+    _require_api_key()
+    return StreamingResponse(_stream_recipe_events(request), media_type="application/x-ndjson")
+
+@router.post("/generate-recipes/batch", response_model=BatchRecipeResponse)
+async def generate_recipes_batch(batch: BatchRecipeRequest):
+    """Generate recipes for many pantries in one call; duplicate pantries are generated once"""
+    logger.info("Received batch request with %d pantries", len(batch.requests))
+    _require_api_key()
+    try:
+        return await batch_service.run(batch.requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in generate_recipes_batch: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate-recipes/batch/jobs", response_model=BatchJobResponse, status_code=202)
+async def submit_batch_job(batch: BatchRecipeRequest):
+    """Start a batch in the background; poll GET /generate-recipes/batch/jobs/{job_id} for the result"""
+    logger.info("Received batch job with %d pantries", len(batch.requests))
+    _require_api_key()
+    try:
+        return await batch_service.submit(batch.requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BatchCapacityError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+@router.get("/generate-recipes/batch/jobs/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(job_id: str):
+    try:
+        job = await batch_service.get(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def _page_response(page: Dict, response: Response, if_none_match: Optional[str]):
+    """Return a page body, or an empty 304 if the client already has this version."""
+    headers = {'ETag': page['etag'], 'Cache-Control': 'private, no-cache'}
+    if page['next_cursor']:
+        headers['X-Next-Cursor'] = page['next_cursor']
+    if _etag_matches(if_none_match, page['etag']):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return page['items']
+
+@router.get("/recipe-history/{user_id}")
+async def get_recipe_history(
+    user_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Newest-first page of history. The next page's cursor is returned in the X-Next-Cursor header."""
     try:
-        return await supabase_service.get_recipe_history(user_id)
+        page = await supabase_service.get_recipe_history(user_id, limit=limit, cursor=cursor, summary=summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching recipe history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    return _page_response(page, response, if_none_match)
 
-@app.post("/favorite-recipe", response_model=FavoriteResponse)
+@router.get("/recipe-history/{user_id}/{history_id}")
+async def get_recipe_history_entry(user_id: str, history_id: str):
+    try:
+        entry = await supabase_service.get_recipe_history_entry(user_id, history_id)
+    except Exception as e:
+        logger.error(f"Error fetching recipe history entry: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Recipe history entry not found")
+    return entry
+
+@router.post("/favorite-recipe", response_model=FavoriteResponse)
 async def toggle_favorite_recipe(request: FavoriteRequest):
     try:
         return await supabase_service.toggle_favorite_recipe(
@@ -109,19 +322,68 @@ async def toggle_favorite_recipe(request: FavoriteRequest):
         logger.error(f"Error toggling favorite recipe: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/favorite-recipes/{user_id}")
-async def get_favorite_recipes(user_id: str):
+@router.get("/favorite-recipes/{user_id}")
+async def get_favorite_recipes(
+    user_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Newest-first page of favorites. The next page's cursor is returned in the X-Next-Cursor header."""
     try:
-        return await supabase_service.get_favorite_recipes(user_id)
+        page = await supabase_service.get_favorite_recipes(user_id, limit=limit, cursor=cursor, summary=summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching favorite recipes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    return _page_response(page, response, if_none_match)
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
-@app.get("/debug-env")
+@router.get("/health/live")
+async def liveness():
+    """The worker is up and its event loop is responsive"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness(request: Request):
+    """503 until this worker's dependencies are warmed up, so traffic is only routed to ready workers"""
+    checks = {
+        "http_client": recipe_service.client is not None,
+        "supabase": supabase_service.ready,
+        "history_writer": history_writer.running,
+    }
+    body = {"status": "ready" if all(checks.values()) else "starting", "checks": checks}
+    error = getattr(request.app.state, "warmup_error", None)
+    if error and not checks["supabase"]:
+        body["error"] = error
+    return JSONResponse(body, status_code=200 if all(checks.values()) else 503)
+
+@router.get("/stats")
+async def stats():
+    """In-process performance counters for this worker"""
+    return {
+        "recipe_cache": recipe_cache.stats(),
+        "recipe_singleflight": recipe_singleflight.stats(),
+        "upstream": recipe_service.guard.stats(),
+        "models": recipe_service.router.stats(),
+        "supabase": supabase_service.stats(),
+        "user_cache": supabase_service.cache.stats(),
+        "history_writer": history_writer.stats(),
+        "batch": batch_service.stats()
+    }
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/debug-env")
 async def debug_env():
     """Debug endpoint to check environment variables (without exposing sensitive data)"""
     supabase_url = os.getenv("SUPABASE_URL", "")
@@ -137,7 +399,7 @@ async def debug_env():
         "env_vars_available": list(os.environ.keys())
     }
 
-@app.get("/test-db/{user_id}")
+@router.get("/test-db/{user_id}")
 async def test_db(user_id: str):
     """Simple test endpoint for database operations"""
     try:
@@ -164,4 +426,14 @@ async def test_db(user_id: str):
     except Exception as e:
         logger.error(f"Database test error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def create_app() -> FastAPI:
+    """Build the ASGI app. Services are shared per process and started by the lifespan."""
+    app = FastAPI(title="PantryToPlate API", lifespan=lifespan)
+    # Per-route latency/status histograms; METRICS_ENABLED=false turns it into a pass-through
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
+    return app
+
+app = create_app()
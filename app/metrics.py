@@ -0,0 +1,299 @@
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import env_bool
+
+logger = logging.getLogger(__name__)
+
+ENABLED = env_bool("METRICS_ENABLED", True)
+SERVER_TIMING = env_bool("METRICS_SERVER_TIMING", False)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans recorded during the current request, when Server-Timing output is on
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_spans", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def _flatten_stats(prefix: str, stats: Dict) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+    """Turn a component's ``stats()`` dict into gauge samples.
+
+    Numeric leaves become ``<prefix>_<key>``. Per-name sub-dicts (e.g. per
+    model or per target stats) become series labelled ``name``.
+    """
+    for key, value in stats.items():
+        if isinstance(value, (int, float)):
+            yield f"{prefix}_{key}", (), float(value)
+        elif isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+            for label, nested in value.items():
+                for field, number in nested.items():
+                    if isinstance(number, (int, float)):
+                        yield f"{prefix}_{key}_{field}", (("name", label),), float(number)
+        elif isinstance(value, dict):
+            # A top-level per-name entry, e.g. ModelRouter.stats() -> {model: {...}}
+            for field, number in value.items():
+                if isinstance(number, (int, float)):
+                    yield f"{prefix}_{field}", (("name", key),), float(number)
+
+
+class Registry:
+    """Holds the process's metrics and renders them in the Prometheus text format.
+
+    Components that already keep counters expose them through ``stats()``;
+    those are registered as collectors and read only when ``/metrics`` is
+    scraped, so they cost nothing on the request path.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Tuple[str, Callable[[], Dict]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict]) -> None:
+        self.collectors = [(p, fn) for p, fn in self.collectors if p != prefix] + [(prefix, stats)]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        for prefix, stats in self.collectors:
+            try:
+                # Samples of one metric must be contiguous in the exposition format
+                samples = sorted(_flatten_stats(prefix, stats()), key=lambda sample: sample[0])
+            except Exception as e:
+                logger.warning(f"Failed to collect {prefix} stats: {str(e)}")
+                continue
+            typed = set()
+            for name, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} gauge")
+                label_names = [label for label, _ in labels]
+                label_values = [label_value for _, label_value in labels]
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("pantry_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("pantry_http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("pantry_http_requests_in_flight", "HTTP requests being served")
+
+UPSTREAM_LATENCY = REGISTRY.histogram("pantry_upstream_request_duration_seconds", "OpenRouter attempt latency", ("model", "outcome"))
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge("pantry_upstream_requests_in_flight", "OpenRouter attempts in flight", ("model",))
+UPSTREAM_ERRORS = REGISTRY.counter("pantry_upstream_errors_total", "Failed OpenRouter attempts by error class", ("model", "error_class"))
+UPSTREAM_TOKENS = REGISTRY.counter("pantry_upstream_tokens_total", "Tokens reported by OpenRouter usage", ("model", "type"))
+
+DB_LATENCY = REGISTRY.histogram("pantry_db_query_duration_seconds", "Supabase query latency including pool wait", ("operation", "outcome"))
+DB_IN_FLIGHT = REGISTRY.gauge("pantry_db_queries_in_flight", "Supabase queries queued or running", ("operation",))
+
+
+def upstream_error_class(error: Exception) -> str:
+    """Bucket an upstream failure for the error counter without unbounded label values."""
+    status = getattr(error, "upstream_status", None)
+    if type(error).__name__ == "CircuitOpenError":
+        return "circuit_open"
+    if status == 429:
+        return "rate_limited"
+    if status is not None and status >= 500:
+        return "http_5xx"
+    if status is not None and status >= 400:
+        return "http_4xx"
+    if getattr(error, "status_code", None) == 504:
+        return "timeout"
+    if status == 200:
+        return "bad_response"
+    return "transport"
+
+
+@contextmanager
+def timed(histogram: Histogram, in_flight: Optional[Gauge], *labels: str, span: Optional[str] = None) -> Iterator[List[str]]:
+    """Time a block into ``histogram`` with an ``outcome`` label appended.
+
+    Yields a one-element list holding the outcome (``ok`` unless an exception
+    escapes); callers may overwrite it. ``in_flight`` is labelled with
+    ``labels`` only. When Server-Timing is on the block is also recorded as a
+    span for the current request.
+    """
+    outcome = ["ok"]
+    if not ENABLED:
+        yield outcome
+        return
+    if in_flight is not None:
+        in_flight.inc(*labels)
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome[0] = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, *labels, outcome[0])
+        if in_flight is not None:
+            in_flight.dec(*labels)
+        spans = _spans.get()
+        if spans is not None and span:
+            spans.append((span, elapsed))
+
+
+def record_tokens(model: str, usage: Optional[Dict]) -> None:
+    if not ENABLED or not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if isinstance(usage.get(kind), (int, float)):
+            UPSTREAM_TOKENS.inc(model, kind[:-len("_tokens")], amount=usage[kind])
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> bytes:
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in spans]
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and in-flight requests.
+
+    Routes are labelled with their path template (``/recipe-history/{user_id}``)
+    to keep label cardinality bounded. With METRICS_SERVER_TIMING on, spans
+    recorded before the response headers go out (upstream and database calls)
+    are returned in a ``Server-Timing`` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = ["500"]
+        spans: Optional[List[Tuple[str, float]]] = [] if SERVER_TIMING else None
+        token = _spans.set(spans)
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+                if spans is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(spans, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _spans.reset(token)
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], path, status[0])
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], path)
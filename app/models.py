@@ -1,19 +1,35 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, validator
 from typing import List, Dict, Optional
 
+RECIPE_SECTIONS = ("recipes", "meal_plan", "grocery_list")
+
 class RecipeRequest(BaseModel):
     ingredients: List[str]
     dietary_restrictions: List[str]
     user_id: Optional[str] = None
+    # Optional output shaping; omitted fields keep the full response
+    sections: Optional[List[str]] = None
+    num_recipes: Optional[int] = Field(None, ge=1, le=10)
+    meal_plan_days: Optional[int] = Field(None, ge=1, le=7)
+
+    @validator("sections")
+    def known_sections(cls, sections):
+        if sections is not None:
+            unknown = set(sections) - set(RECIPE_SECTIONS)
+            if unknown or not sections:
+                raise ValueError(f"sections must be a non-empty subset of {list(RECIPE_SECTIONS)}")
+        return sections
 
 class Recipe(BaseModel):
     name: str
     instructions: str
 
 class RecipeResponse(BaseModel):
-    recipes: List[Recipe]
-    meal_plan: Dict[str, str]
-    grocery_list: List[str]
+    # Sections a client did not request come back empty; parse_recipe_response
+    # rejects completions missing a requested one
+    recipes: List[Recipe] = []
+    meal_plan: Dict[str, str] = {}
+    grocery_list: List[str] = []
 
 class FavoriteRequest(BaseModel):
     user_id: str
@@ -23,4 +39,33 @@ class FavoriteRequest(BaseModel):
 class FavoriteResponse(BaseModel):
     status: str
     recipe: Optional[Dict] = None
-    recipe_id: Optional[str] = None 
\ No newline at end of file
+    recipe_id: Optional[str] = None 
+
+class BatchRecipeRequest(BaseModel):
+    requests: List[RecipeRequest]
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    result: Optional[RecipeResponse] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+class BatchRecipeResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    unique: int
+    succeeded: int
+    failed: int
+    history_saved: int
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: float
+    finished_at: Optional[float] = None
+    result: Optional[BatchRecipeResponse] = None
+    error: Optional[str] = None
@@ -0,0 +1,65 @@
+"""Production entry point: ``python -m app.server``.
+
+Runs ``app.main:app`` under uvicorn with one worker process per available
+CPU (override with ``WEB_CONCURRENCY``). Uses uvloop and httptools when they
+are installed and falls back to asyncio and h11 otherwise.
+
+The worker count is exported as ``WEB_CONCURRENCY`` so per-process state
+(the user cache, the batch job store) can tell it shares the load with
+other workers.
+"""
+import os
+import logging
+import importlib.util
+from typing import Dict
+
+import uvicorn
+
+from .config import env_bool
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _default_workers() -> int:
+    # Respect CPU affinity/cgroup pinning where the platform exposes it
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def server_config() -> Dict:
+    workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+    # Inherited by the workers, which read it when the app module is imported
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    return {
+        "app": "app.main:app",
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", "8000")),
+        "workers": workers,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        # The API serves no websockets
+        "ws": "none",
+        "proxy_headers": True,
+        # Only trust X-Forwarded-* from the proxy in front of us; "*" would let clients spoof their address
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "timeout_keep_alive": int(os.getenv("KEEPALIVE_TIMEOUT", "5")),
+        # Per-request access lines are costly at high RPS; /metrics records every request anyway
+        "access_log": env_bool("ACCESS_LOG", False),
+        "log_level": os.getenv("UVICORN_LOG_LEVEL", "info"),
+    }
+
+
+def main() -> None:
+    config = server_config()
+    logger.info("Starting %d worker(s) with loop=%s http=%s", config["workers"], config["loop"], config["http"])
+    uvicorn.run(**config)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
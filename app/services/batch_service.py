@@ -0,0 +1,234 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .recipe_cache import CacheBackend, create_cache_backend, make_cache_key
+from .prompt_builder import PromptOptions
+from .resilience import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+
+JOB_KEY_PREFIX = "batch-job:"
+
+
+class BatchCapacityError(Exception):
+    """Too many batch jobs are already running in this worker."""
+
+
+def create_job_store() -> CacheBackend:
+    # Any worker may receive the poll, so several workers default to the store shared on this host
+    workers = int(os.getenv("WEB_CONCURRENCY") or "1")
+    return create_cache_backend("BATCH_JOB", default_backend="sqlite" if workers > 1 else "memory",
+                                default_sqlite_path="/tmp/pantrytoplate-batch-jobs.sqlite3")
+
+
+class _Job:
+    def __init__(self, total: int):
+        self.job_id = uuid.uuid4().hex
+        self.status = "queued"
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class BatchService:
+    """Generate recipes for many pantries at once.
+
+    Requests with the same canonical pantry (see ``make_cache_key``) are
+    generated once and the result is shared across all of them. Unique
+    pantries are generated with at most ``max_concurrency`` calls in flight.
+    History rows for every request that has a ``user_id`` are saved as
+    multi-row inserts after generation.
+
+    Jobs submitted with ``submit`` run in the background of this worker. Their
+    status is published to ``store`` as they progress, so any worker sharing
+    the store can answer a poll, and kept for ``job_ttl_seconds`` after the
+    last update.
+    """
+
+    def __init__(self, generate: Callable[[Any], Awaitable[Dict]], supabase_service,
+                 max_concurrency: Optional[int] = None, max_requests: Optional[int] = None,
+                 store: Optional[CacheBackend] = None):
+        self.generate = generate
+        self.supabase_service = supabase_service
+        self.max_concurrency = max_concurrency or int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+        self.max_requests = max_requests or int(os.getenv("BATCH_MAX_REQUESTS", "500"))
+        self.history_chunk_size = int(os.getenv("BATCH_HISTORY_CHUNK_SIZE", "100"))
+        self.max_jobs = int(os.getenv("BATCH_MAX_JOBS", "20"))
+        self.job_ttl_seconds = float(os.getenv("BATCH_JOB_TTL_SECONDS", "3600"))
+        self.store = store or create_job_store()
+        # Jobs running in this worker; finished ones only live in the store
+        self._jobs: Dict[str, _Job] = {}
+        self.store_errors = 0
+
+        self.batches = 0
+        self.requests = 0
+        self.deduplicated = 0
+        self.failures = 0
+
+    def validate(self, requests: List[Any]) -> None:
+        if not requests:
+            raise ValueError("Batch must contain at least one request")
+        if len(requests) > self.max_requests:
+            raise ValueError(f"Batch contains {len(requests)} requests, the limit is {self.max_requests}")
+
+    async def run(self, requests: List[Any], job: Optional[_Job] = None) -> Dict:
+        """Generate every request in the batch and save history. Results keep the input order."""
+        self.validate(requests)
+        self.batches += 1
+        self.requests += len(requests)
+
+        groups: Dict[str, List[int]] = {}
+        for index, request in enumerate(requests):
+            key = make_cache_key(request.ingredients, request.dietary_restrictions,
+                                 PromptOptions.from_request(request).cache_key())
+            groups.setdefault(key, []).append(index)
+        self.deduplicated += len(requests) - len(groups)
+        logger.info("Running batch of %d requests (%d unique pantries)", len(requests), len(groups))
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+        results: List[Optional[Dict]] = [None] * len(requests)
+
+        async def generate_group(indices: List[int]) -> None:
+            async with slots:
+                try:
+                    outcome = {"status": "ok", "result": await self.generate(requests[indices[0]])}
+                except UpstreamError as e:
+                    outcome = {"status": "error", "error": str(e), "status_code": e.status_code}
+                except Exception as e:
+                    logger.error(f"Error generating batch item: {str(e)}")
+                    outcome = {"status": "error", "error": str(e), "status_code": 500}
+            for index in indices:
+                results[index] = {"index": index, **outcome}
+            if outcome["status"] == "error":
+                self.failures += len(indices)
+            if job is not None:
+                job.completed += len(indices)
+                if outcome["status"] == "error":
+                    job.failed += len(indices)
+                await self._publish(job)
+
+        await asyncio.gather(*(generate_group(indices) for indices in groups.values()))
+
+        entries: List[Tuple[str, Dict]] = [
+            (request.user_id, {
+                'ingredients': request.ingredients,
+                'dietary_restrictions': request.dietary_restrictions,
+                **results[index]["result"]
+            })
+            for index, request in enumerate(requests)
+            if request.user_id and results[index]["status"] == "ok"
+        ]
+        history_saved = await self._save_history(entries)
+
+        succeeded = sum(1 for item in results if item["status"] == "ok")
+        return {
+            "results": results,
+            "total": len(requests),
+            "unique": len(groups),
+            "succeeded": succeeded,
+            "failed": len(requests) - succeeded,
+            "history_saved": history_saved,
+        }
+
+    async def _save_history(self, entries: List[Tuple[str, Dict]]) -> int:
+        saved = 0
+        for start in range(0, len(entries), self.history_chunk_size):
+            chunk = entries[start:start + self.history_chunk_size]
+            try:
+                await self.supabase_service.save_recipe_history_batch(chunk)
+                saved += len(chunk)
+            except Exception as e:
+                # Generated recipes are still returned; only the history rows are lost
+                logger.error(f"Failed to save {len(chunk)} batch history rows: {str(e)}")
+        return saved
+
+    async def _publish(self, job: _Job) -> None:
+        try:
+            await self.store.set(JOB_KEY_PREFIX + job.job_id, job.snapshot(), self.job_ttl_seconds)
+        except Exception as e:
+            # The job keeps running; pollers just see its previous state until the next update
+            self.store_errors += 1
+            logger.error("Failed to publish batch job %s: %s", job.job_id, str(e))
+
+    async def submit(self, requests: List[Any]) -> Dict:
+        """Start a batch job in the background and return its initial status."""
+        self.validate(requests)
+        if len(self._jobs) >= self.max_jobs:
+            raise BatchCapacityError(f"{len(self._jobs)} batch jobs are already running, try again later")
+        job = _Job(len(requests))
+        self._jobs[job.job_id] = job
+        # Published before returning so the first poll finds it on any worker
+        await self._publish(job)
+        job.task = asyncio.ensure_future(self._run_job(job, requests))
+        return job.snapshot()
+
+    async def _run_job(self, job: _Job, requests: List[Any]) -> None:
+        job.status = "running"
+        try:
+            job.result = await self.run(requests, job)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job.job_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            try:
+                await self._publish(job)
+            finally:
+                del self._jobs[job.job_id]
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        try:
+            return await self.store.get(JOB_KEY_PREFIX + job_id)
+        except Exception as e:
+            self.store_errors += 1
+            logger.error("Failed to read batch job %s: %s", job_id, str(e))
+            raise
+
+    async def aclose(self) -> None:
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.store.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "failures": self.failures,
+            "running_jobs": len(self._jobs),
+            "store_errors": self.store_errors,
+            "max_concurrency": self.max_concurrency,
+        }
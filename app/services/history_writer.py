@@ -0,0 +1,149 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Write-behind queue that persists recipe history off the request path.
+
+    Rows are queued in memory and flushed to ``recipe_history`` as multi-row
+    inserts once ``batch_size`` rows are waiting or ``flush_interval`` seconds
+    have passed. Failed batches are retried with exponential backoff. The
+    queue is bounded: when it is full (e.g. the database is down) new rows are
+    dropped and counted instead of growing memory without limit.
+    """
+
+    def __init__(self, supabase_service, max_queue_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_retries: Optional[int] = None):
+        self.supabase_service = supabase_service
+        self.max_queue_size = max_queue_size or int(os.getenv("HISTORY_QUEUE_MAX_SIZE", "1000"))
+        self.batch_size = batch_size or int(os.getenv("HISTORY_BATCH_SIZE", "50"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("HISTORY_MAX_RETRIES", "5"))
+        self.retry_base_delay = float(os.getenv("HISTORY_RETRY_BASE_DELAY", "0.5"))
+        self.shutdown_timeout = float(os.getenv("HISTORY_SHUTDOWN_TIMEOUT", "10"))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.ensure_future(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def enqueue(self, user_id: str, recipe_data: Dict) -> bool:
+        """Queue a history row for persistence. Returns False if it was dropped."""
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            logger.error(f"History writer is not running, dropping history for user: {user_id}")
+            return False
+        try:
+            self._queue.put_nowait((user_id, recipe_data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            # Rate-limit the log line: when the DB is down this fires for every request
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.error(f"History queue full ({self.max_queue_size}), dropped {self.dropped} rows so far")
+            return False
+        self.enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def stop(self) -> None:
+        """Flush whatever is queued, then stop the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._batch_ready.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"History writer shutdown timed out with {self._queue.qsize()} rows not persisted")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            if not self._stopping and self._queue.qsize() + 1 < self.batch_size:
+                # Give the batch window a chance to fill before flushing
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if not self._stopping:
+                self._batch_ready.clear()
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[str, Dict]]) -> None:
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.supabase_service.save_recipe_history_batch(batch)
+                self.written += len(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or self._stopping:
+                    self.failed_batches += 1
+                    self.dropped += len(batch)
+                    logger.error(f"Giving up on {len(batch)} history rows after {attempt + 1} attempts: {str(e)}")
+                    break
+                self.retries += 1
+                delay = self.retry_base_delay * (2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+                logger.warning("History flush failed (attempt %d), retrying in %.2fs: %s", attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+
+        self.flushes += 1
+        self.last_flush_latency = time.perf_counter() - started
+        self.total_flush_latency += self.last_flush_latency
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "flushes": self.flushes,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 2),
+            "avg_flush_latency_ms": round(self.total_flush_latency / self.flushes * 1000, 2) if self.flushes else 0.0,
+        }
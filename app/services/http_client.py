@@ -0,0 +1,47 @@
+import os
+import logging
+import httpx
+
+from ..config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared AsyncClient used for calls to OpenRouter.
+
+    The client is meant to live for the whole app lifespan so connections
+    (and their TLS sessions) are reused across requests.
+    """
+    limits = httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(
+        connect=env_float("HTTP_CONNECT_TIMEOUT", 5.0),
+        read=env_float("HTTP_READ_TIMEOUT", 30.0),
+        write=env_float("HTTP_WRITE_TIMEOUT", 10.0),
+        pool=env_float("HTTP_POOL_TIMEOUT", 5.0),
+    )
+    http2 = env_bool("HTTP_ENABLE_HTTP2", True)
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    logger.info(f"Creating shared HTTP client (http2={http2}, max_connections={limits.max_connections})")
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=http2,
+        verify=env_bool("HTTP_VERIFY_SSL", False),
+        follow_redirects=True,
+    )
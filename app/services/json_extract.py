@@ -0,0 +1,153 @@
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..models import RECIPE_SECTIONS, Recipe, RecipeResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Strings (closed, or running to the end of a truncated text) and structural characters.
+# The string alternatives are disjoint, so matching is linear with no backtracking.
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(?:(")|\\?\Z)|[{}\[\],:]', re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def loads(text: str) -> Any:
+    """``json.loads`` that uses orjson when installed and tolerates raw control characters in strings."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text, strict=False)
+
+
+def _repair(content: str, start: int) -> Tuple[str, bool]:
+    """Scan the object starting at ``start`` once; drop trailing commas and close a truncated tail.
+
+    Returns the repaired text and whether the object had to be truncated.
+    """
+    stack: List[str] = []
+    drops: List[int] = []
+    # Last position where everything before it is complete. The stack only changes at
+    # brackets, which always move this point, so ``stack`` is also what is open there.
+    safe_end = start
+    pending_comma: Optional[int] = None
+    expect_value = False
+    end: Optional[int] = None
+
+    for match in _TOKEN.finditer(content, start):
+        token = match.group()
+        if token[0] == '"':
+            if match.group(1) is None:
+                break  # string cut off by max_tokens
+            if expect_value or (stack and stack[-1] == "]"):
+                safe_end = match.end()
+            expect_value = False
+            continue
+        if token == ":":
+            expect_value = True
+            continue
+        expect_value = False
+        if token == ",":
+            pending_comma = match.start()
+            safe_end = match.start()
+            continue
+        if token in _CLOSERS:
+            pending_comma = None
+            stack.append(_CLOSERS[token])
+            safe_end = match.end()
+            continue
+        # Closing bracket
+        if not stack or stack[-1] != token:
+            raise ValueError(f"Mismatched '{token}' at offset {match.start()}")
+        if pending_comma is not None and not content[pending_comma + 1:match.start()].strip():
+            drops.append(pending_comma)
+        pending_comma = None
+        stack.pop()
+        if not stack:
+            end = match.end()
+            break
+        safe_end = match.end()
+
+    truncated = end is None
+    if truncated:
+        end = safe_end
+    pieces = []
+    position = start
+    for drop in drops:
+        if drop >= end:
+            break
+        pieces.append(content[position:drop])
+        position = drop + 1
+    pieces.append(content[position:end])
+    if truncated:
+        pieces.extend(reversed(stack))
+    return "".join(pieces), truncated
+
+
+def extract_json_object(content: str) -> Dict:
+    """Return the first top-level JSON object in an LLM completion.
+
+    Surrounding prose and markdown fences are ignored, trailing commas are
+    removed, and an object cut off by ``max_tokens`` is closed after its last
+    complete element. Runs in a single linear pass over the text.
+    """
+    start = content.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found in content")
+    # Fast path for well-formed objects, fenced or not: one C-level parse of the outermost braces
+    try:
+        data = loads(content[start:content.rfind("}") + 1])
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+
+    repaired, truncated = _repair(content, start)
+    if truncated:
+        logger.warning("Completion was truncated after %d chars; closed it at its last complete element", len(content) - start)
+    data = loads(repaired)
+    if not isinstance(data, dict):
+        raise ValueError("Top-level JSON value is not an object")
+    return data
+
+
+def parse_recipe_response(content: str, sections: Optional[Sequence[str]] = None) -> Dict:
+    """Extract, repair and validate a completion into a ``RecipeResponse`` dict.
+
+    ``sections`` are the sections the completion must contain (all of them by
+    default); sections that were not requested come back empty. Recipes that
+    are incomplete (e.g. missing instructions after truncation) are dropped
+    rather than failing the whole response, but a missing requested section,
+    or no usable recipe when recipes were requested, raises ValueError so an
+    empty result is never served or cached.
+    """
+    sections = RECIPE_SECTIONS if sections is None else sections
+    data = extract_json_object(content)
+    missing = [section for section in sections if section not in data]
+    if missing:
+        raise ValueError(f"Completion is missing requested sections: {', '.join(missing)}")
+    try:
+        result = RecipeResponse.parse_obj(data).dict()
+    except ValueError:
+        recipes = data.get("recipes")
+        if not isinstance(recipes, list):
+            raise
+        valid = []
+        for recipe in recipes:
+            try:
+                valid.append(Recipe.parse_obj(recipe))
+            except ValueError:
+                continue
+        logger.warning("Dropped %d incomplete recipes from completion", len(recipes) - len(valid))
+        result = RecipeResponse.parse_obj({**data, "recipes": valid}).dict()
+    if "recipes" in sections and not result["recipes"]:
+        raise ValueError("Completion contains no complete recipe")
+    return result
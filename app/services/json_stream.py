@@ -0,0 +1,158 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .json_extract import loads
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalJSONScanner:
+    """Incrementally scan a streamed JSON object and report completed pieces.
+
+    Text is fed in arbitrary chunks (e.g. LLM tokens). Every time a top-level
+    value finishes, ``feed`` returns a ``("value", key, value)`` event, and for
+    top-level arrays each finished element is reported as
+    ``("element", key, value)`` as soon as its closing bracket arrives. Any
+    text before the first ``{`` (such as a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._phase = "key"
+        self._key_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._value_kind: Optional[str] = None
+        self._value_is_array = False
+        self._elem_start: Optional[int] = None
+        self._elem_kind: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        self.text += chunk
+        events: List[Tuple[str, str, Any]] = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            self._step(text, i, text[i], events)
+        self._pos = len(text)
+        return events
+
+    def _emit(self, events: List, kind: str, raw: str) -> None:
+        try:
+            # Same tolerant parse as the final result, so raw newlines in strings don't drop a recipe
+            value = loads(raw)
+        except ValueError:
+            logger.warning("Skipping unparseable streamed %s for key %s", kind, self._key)
+            return
+        if kind == "value":
+            self.values[self._key] = value
+        events.append((kind, self._key, value))
+
+    def _end_value(self, events: List, end: int) -> None:
+        self._emit(events, "value", self.text[self._value_start:end])
+        self._value_start = None
+        self._value_kind = None
+        self._value_is_array = False
+        self._elem_start = None
+        self._phase = "after_value"
+
+    def _step(self, text: str, i: int, c: str, events: List) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._depth == 1 and self._phase == "key":
+                    self._key = json.loads(text[self._key_start:i + 1])
+                    self._phase = "colon"
+                elif self._depth == 1 and self._value_kind == "string":
+                    self._end_value(events, i + 1)
+                elif self._depth == 2 and self._value_is_array and self._elem_kind == "string":
+                    self._emit(events, "element", text[self._elem_start:i + 1])
+                    self._elem_start = None
+            return
+
+        if self._depth == 0:
+            if c == "{":
+                self._depth = 1
+                self._phase = "key"
+            return
+
+        if c.isspace():
+            return
+
+        if self._depth == 1:
+            if self._phase == "key":
+                if c == '"':
+                    self._in_string = True
+                    self._key_start = i
+                elif c == "}":
+                    self._depth = 0
+                    self.done = True
+            elif self._phase == "colon":
+                if c == ":":
+                    self._phase = "value"
+            elif self._phase == "value":
+                if self._value_start is None:
+                    self._value_start = i
+                    if c in "{[":
+                        self._value_kind = "container"
+                        self._value_is_array = c == "["
+                        self._depth = 2
+                    elif c == '"':
+                        self._value_kind = "string"
+                        self._in_string = True
+                    else:
+                        self._value_kind = "scalar"
+                elif c in ",}":
+                    self._end_value(events, i)
+                    self._phase = "key"
+                    if c == "}":
+                        self._depth = 0
+                        self.done = True
+            elif self._phase == "after_value":
+                if c == ",":
+                    self._phase = "key"
+                elif c == "}":
+                    self._depth = 0
+                    self.done = True
+            return
+
+        at_element_level = self._depth == 2 and self._value_is_array
+        if c == '"':
+            self._in_string = True
+            if at_element_level and self._elem_start is None:
+                self._elem_start = i
+                self._elem_kind = "string"
+        elif c in "{[":
+            if at_element_level and self._elem_start is None:
+                self._elem_start = i
+                self._elem_kind = "container"
+            self._depth += 1
+        elif c in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                if self._value_is_array and self._elem_start is not None and self._elem_kind == "scalar":
+                    self._emit(events, "element", text[self._elem_start:i])
+                self._end_value(events, i + 1)
+            elif self._depth == 2 and self._value_is_array and self._elem_kind == "container":
+                self._emit(events, "element", text[self._elem_start:i + 1])
+                self._elem_start = None
+        elif at_element_level:
+            if c == ",":
+                if self._elem_start is not None and self._elem_kind == "scalar":
+                    self._emit(events, "element", text[self._elem_start:i])
+                self._elem_start = None
+            elif self._elem_start is None:
+                self._elem_start = i
+                self._elem_kind = "scalar"
@@ -0,0 +1,125 @@
+import os
+import json
+import random
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = [{"name": "gpt-3.5-turbo", "max_tokens": 2000}]
+
+
+class ModelConfig:
+    """One model in the routing pool and its per-model budgets."""
+
+    def __init__(self, name: str, max_tokens: int = 2000, timeout: Optional[float] = None,
+                 cost_per_1k_tokens: float = 0.0, max_ingredients: Optional[int] = None,
+                 temperature: float = 0.7, json_mode: Optional[bool] = None):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.max_ingredients = max_ingredients
+        self.temperature = temperature
+        # None defers to PROMPT_JSON_MODE; not every provider supports response_format
+        self.json_mode = json_mode
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ModelConfig":
+        return cls(
+            name=data["name"],
+            max_tokens=int(data.get("max_tokens", 2000)),
+            timeout=float(data["timeout"]) if data.get("timeout") is not None else None,
+            cost_per_1k_tokens=float(data.get("cost_per_1k_tokens", 0.0)),
+            max_ingredients=int(data["max_ingredients"]) if data.get("max_ingredients") is not None else None,
+            temperature=float(data.get("temperature", 0.7)),
+            json_mode=data.get("json_mode"),
+        )
+
+
+class ModelStats:
+    """Exponentially weighted moving averages of latency and error rate."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.failures += 1
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+        # Failed calls still tell us how long the model made us wait
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+
+
+def load_models_from_env() -> List[ModelConfig]:
+    """Read the model pool from OPENROUTER_MODELS.
+
+    Accepts either a JSON list of model objects or a comma-separated list of
+    model names, in order of preference. Raises ValueError for an empty pool.
+    """
+    raw = os.getenv("OPENROUTER_MODELS", "").strip()
+    if not raw:
+        return [ModelConfig.from_dict(model) for model in DEFAULT_MODELS]
+    if raw.startswith("["):
+        models = [ModelConfig.from_dict(model) for model in json.loads(raw)]
+    else:
+        models = [ModelConfig(name.strip()) for name in raw.split(",") if name.strip()]
+    if not models:
+        raise ValueError("OPENROUTER_MODELS must list at least one model")
+    return models
+
+
+class ModelRouter:
+    """Order the model pool by observed latency, error rate and cost.
+
+    Each model's score is its EWMA latency plus ``error_penalty`` seconds per
+    unit of EWMA error rate, plus cost. The penalty is additive so a model that
+    fails fast cannot outrank a slower healthy one. Models that have not been
+    tried yet score as the configured ``default_latency`` (0 by default, so
+    every model gets tried once before the router settles). Ties keep the
+    configured order.
+    """
+
+    def __init__(self, models: Optional[List[ModelConfig]] = None):
+        self.models = models or load_models_from_env()
+        self.alpha = float(os.getenv("MODEL_ROUTER_EWMA_ALPHA", "0.2"))
+        self.error_penalty = float(os.getenv("MODEL_ROUTER_ERROR_PENALTY", "5.0"))
+        self.cost_weight = float(os.getenv("MODEL_ROUTER_COST_WEIGHT", "0.0"))
+        self.default_latency = float(os.getenv("MODEL_ROUTER_DEFAULT_LATENCY", "0.0"))
+        # Share of requests routed to a random model first so penalized models can recover
+        self.explore_rate = float(os.getenv("MODEL_ROUTER_EXPLORE_RATE", "0.05"))
+        self.stats_by_model: Dict[str, ModelStats] = {model.name: ModelStats(self.alpha) for model in self.models}
+
+    def score(self, model: ModelConfig) -> float:
+        stats = self.stats_by_model[model.name]
+        latency = stats.latency if stats.latency is not None else self.default_latency
+        return latency + self.error_penalty * stats.error_rate + self.cost_weight * model.cost_per_1k_tokens
+
+    def candidates(self) -> List[ModelConfig]:
+        """Models to try for the next request, best first; later entries are fallbacks."""
+        ranked = sorted(self.models, key=self.score)
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            explored = random.choice(ranked[1:])
+            ranked.remove(explored)
+            ranked.insert(0, explored)
+        return ranked
+
+    def record(self, model: ModelConfig, latency: float, ok: bool) -> None:
+        self.stats_by_model[model.name].record(latency, ok)
+
+    def stats(self) -> Dict:
+        return {
+            model.name: {
+                "requests": self.stats_by_model[model.name].requests,
+                "failures": self.stats_by_model[model.name].failures,
+                "ewma_latency_ms": round((self.stats_by_model[model.name].latency or 0.0) * 1000, 1),
+                "ewma_error_rate": round(self.stats_by_model[model.name].error_rate, 4),
+                "score": round(self.score(model), 4),
+            }
+            for model in self.models
+        }
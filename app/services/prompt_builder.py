@@ -0,0 +1,167 @@
+import os
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from ..config import env_bool
+from ..models import RECIPE_SECTIONS
+from .model_router import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+WEEK_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+SYSTEM_PROMPT = "You are a helpful cooking assistant that creates recipes and meal plans. Always respond with valid JSON."
+COMPACT_SYSTEM_PROMPT = "You are a cooking assistant. Reply with one minified JSON object and nothing else."
+
+
+class PromptOptions:
+    """Which sections a client wants and how large each should be."""
+
+    def __init__(self, sections: Optional[Sequence[str]] = None, num_recipes: Optional[int] = None,
+                 meal_plan_days: Optional[int] = None):
+        self.sections = tuple(s for s in RECIPE_SECTIONS if s in sections) if sections else RECIPE_SECTIONS
+        self.num_recipes = num_recipes or int(os.getenv("PROMPT_DEFAULT_RECIPES", "3"))
+        self.meal_plan_days = meal_plan_days or len(WEEK_DAYS)
+
+    @classmethod
+    def from_request(cls, request) -> "PromptOptions":
+        return cls(
+            sections=getattr(request, "sections", None),
+            num_recipes=getattr(request, "num_recipes", None),
+            meal_plan_days=getattr(request, "meal_plan_days", None),
+        )
+
+    def cache_key(self) -> Optional[Dict]:
+        """Canonical form for cache keys, or None when these are the default options."""
+        if self == PromptOptions():
+            return None
+        return {"sections": list(self.sections), "num_recipes": self.num_recipes, "meal_plan_days": self.meal_plan_days}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PromptOptions) and (
+            (self.sections, self.num_recipes, self.meal_plan_days)
+            == (other.sections, other.num_recipes, other.meal_plan_days)
+        )
+
+
+def cap_ingredients(ingredients: List[str], limit: Optional[int]) -> List[str]:
+    """Drop blanks and case-insensitive duplicates, keeping the first ``limit`` items."""
+    seen = set()
+    kept = []
+    for ingredient in ingredients:
+        folded = ingredient.strip().lower()
+        if folded and folded not in seen:
+            seen.add(folded)
+            kept.append(ingredient.strip())
+    return kept[:limit] if limit else kept
+
+
+class PromptBuilder:
+    """Build the chat payload for a recipe request.
+
+    The ``compact`` style (default) describes the expected JSON shape in one
+    line instead of an indented example and only asks for the requested
+    sections. ``max_tokens`` is sized from the requested output instead of
+    always reserving the model's full budget, since output tokens dominate
+    latency. ``verbose`` keeps the original prompt for comparison.
+    """
+
+    def __init__(self):
+        self.style = os.getenv("PROMPT_STYLE", "compact").strip().lower()
+        self.json_mode = env_bool("PROMPT_JSON_MODE", False)
+        self.max_ingredients = int(os.getenv("PROMPT_MAX_INGREDIENTS", "30"))
+        self.tokens_per_recipe = int(os.getenv("PROMPT_TOKENS_PER_RECIPE", "250"))
+        self.tokens_per_meal_plan_day = int(os.getenv("PROMPT_TOKENS_PER_MEAL_PLAN_DAY", "15"))
+        self.tokens_grocery_list = int(os.getenv("PROMPT_TOKENS_GROCERY_LIST", "150"))
+        self.tokens_overhead = int(os.getenv("PROMPT_TOKENS_OVERHEAD", "50"))
+
+    def max_tokens(self, options: PromptOptions, model: ModelConfig) -> int:
+        estimate = self.tokens_overhead
+        if "recipes" in options.sections:
+            estimate += options.num_recipes * self.tokens_per_recipe
+        if "meal_plan" in options.sections:
+            estimate += options.meal_plan_days * self.tokens_per_meal_plan_day
+        if "grocery_list" in options.sections:
+            estimate += self.tokens_grocery_list
+        return min(model.max_tokens, estimate)
+
+    def build(self, ingredients: List[str], dietary_restrictions: List[str], options: PromptOptions,
+              model: ModelConfig) -> Dict:
+        """Return the model-specific part of the chat completion payload."""
+        limits = [limit for limit in (self.max_ingredients, model.max_ingredients) if limit]
+        ingredients = cap_ingredients(ingredients, min(limits) if limits else None)
+
+        if self.style == "verbose":
+            system, prompt = SYSTEM_PROMPT, self._verbose_prompt(ingredients, dietary_restrictions)
+            max_tokens = model.max_tokens
+        else:
+            system, prompt = COMPACT_SYSTEM_PROMPT, self._compact_prompt(ingredients, dietary_restrictions, options)
+            max_tokens = self.max_tokens(options, model)
+
+        payload = {
+            "model": model.name,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": model.temperature,
+            "max_tokens": max_tokens
+        }
+        json_mode = model.json_mode if model.json_mode is not None else self.json_mode
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def _compact_prompt(self, ingredients: List[str], dietary_restrictions: List[str], options: PromptOptions) -> str:
+        shape = []
+        if "recipes" in options.sections:
+            shape.append(f'"recipes":[{{"name":str,"instructions":str}}] ({options.num_recipes} recipes)')
+        if "meal_plan" in options.sections:
+            days = ",".join(WEEK_DAYS[:options.meal_plan_days])
+            shape.append(f'"meal_plan":{{day:recipe name}} (days: {days})')
+        if "grocery_list" in options.sections:
+            shape.append('"grocery_list":[str] (items to buy)')
+        return (
+            f"Ingredients: {', '.join(ingredients)}. "
+            f"Dietary restrictions: {', '.join(dietary_restrictions) or 'none'}. "
+            f"JSON keys: {'; '.join(shape)}."
+        )
+
+    def _verbose_prompt(self, ingredients: List[str], dietary_restrictions: List[str]) -> str:
+        return f"""Given these ingredients: {', '.join(ingredients)}
+        and dietary restrictions: {', '.join(dietary_restrictions)},
+        please provide:
+        1. 3 possible recipes that can be made
+        2. A weekly meal plan
+        3. A grocery shopping list
+
+        Respond with ONLY a JSON object containing these keys:
+        - recipes: array of objects, each with 'name' and 'instructions'
+        - meal_plan: object with days of the week as keys
+        - grocery_list: array of strings
+
+        Example format:
+        {{
+            "recipes": [
+                {{
+                    "name": "Recipe Name",
+                    "instructions": "Step by step instructions"
+                }}
+            ],
+            "meal_plan": {{
+                "Monday": "Recipe Name",
+                "Tuesday": "Another Recipe"
+            }},
+            "grocery_list": ["item 1", "item 2"]
+        }}
+
+        Ensure the response is a valid JSON object without any markdown formatting or code blocks."""
+
+
+def restrict_sections(data: Dict, options: PromptOptions) -> Dict:
+    """Empty any section the client did not ask for and trim extra recipes, in case the model ignored the prompt."""
+    empty = {"recipes": [], "meal_plan": {}, "grocery_list": []}
+    restricted = {section: data.get(section, empty[section]) if section in options.sections else empty[section]
+                  for section in RECIPE_SECTIONS}
+    restricted["recipes"] = restricted["recipes"][:options.num_recipes]
+    return restricted
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+from ..config import env_bool
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_VERSION = "v1"
+
+# Singulars ending in "ie", whose plurals would otherwise fold to "-y" ("cookies" -> "cooky")
+_IE_SINGULARS = frozenset({
+    "brownie", "calorie", "cookie", "foodie", "goodie", "hoagie", "pie", "smoothie", "veggie",
+})
+
+
+def _singularize(word: str) -> str:
+    # Cheap plural folding, good enough for pantry items ("tomatoes" -> "tomato")
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        if word[:-1] in _IE_SINGULARS:
+            return word[:-1]
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "sses", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_term(term: str) -> str:
+    words = term.strip().lower().split()
+    if not words:
+        return ""
+    words[-1] = _singularize(words[-1])
+    return " ".join(words)
+
+
+def normalize_terms(terms: List[str]) -> List[str]:
+    return sorted({normalized for normalized in (normalize_term(t) for t in terms) if normalized})
+
+
+def make_cache_key(ingredients: List[str], dietary_restrictions: List[str], options: Optional[Dict] = None) -> str:
+    """Build a cache key that is stable across order, case, duplicates and plurals.
+
+    ``options`` is the canonical form of non-default output options (see
+    ``PromptOptions.cache_key``); default requests keep their existing keys.
+    """
+    key = {
+        "ingredients": normalize_terms(ingredients),
+        "dietary_restrictions": normalize_terms(dietary_restrictions),
+    }
+    if options is not None:
+        key["options"] = options
+    canonical = json.dumps(key, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"recipe:{CACHE_KEY_VERSION}:{digest}"
+
+
+class CacheBackend(ABC):
+    """Interface for recipe cache storage backends."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict, ttl_seconds: float) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache with TTL expiry."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict, ttl_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """File-backed LRU cache shared by every worker on the same host.
+
+    Acts as a local stand-in for a shared store such as Redis: all uvicorn
+    workers pointing at the same file see each other's entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        # Row count as of this worker's last write; stats() must not query sqlite on the event loop
+        self.size = 0
+        with closing(self._connect()) as conn:
+            conn.execute("pragma journal_mode=wal")
+            conn.execute(
+                "create table if not exists recipe_cache ("
+                "key text primary key, value text not null, expires_at real not null, accessed_at real not null)"
+            )
+            conn.execute("create index if not exists recipe_cache_accessed_at_idx on recipe_cache(accessed_at)")
+            self.size = conn.execute("select count(*) from recipe_cache").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def _get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute("select value, expires_at from recipe_cache where key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("delete from recipe_cache where key = ?", (key,))
+                return None
+            conn.execute("update recipe_cache set accessed_at = ? where key = ?", (now, key))
+            return json.loads(row[0])
+
+    def _set(self, key: str, value: Dict, ttl_seconds: float) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "insert or replace into recipe_cache (key, value, expires_at, accessed_at) values (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl_seconds, now),
+            )
+            conn.execute("delete from recipe_cache where expires_at <= ?", (now,))
+            size = conn.execute("select count(*) from recipe_cache").fetchone()[0]
+            overflow = size - self.max_entries
+            self.size = min(size, self.max_entries)
+            if overflow > 0:
+                conn.execute(
+                    "delete from recipe_cache where key in "
+                    "(select key from recipe_cache order by accessed_at asc limit ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def _clear(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("delete from recipe_cache")
+        self.size = 0
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Dict, ttl_seconds: float) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl_seconds)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+    def stats(self) -> Dict:
+        return {"backend": "sqlite", "path": self.path, "size": self.size, "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis-backed cache shared across workers and hosts.
+
+    TTL is enforced by Redis; LRU eviction relies on the server being
+    configured with ``maxmemory-policy allkeys-lru``.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise Exception("The redis cache backend requires the 'redis' package to be installed")
+        self.url = url
+        self.client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Dict, ttl_seconds: float) -> None:
+        await self.client.set(key, json.dumps(value), ex=max(1, int(ttl_seconds)))
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=f"recipe:{CACHE_KEY_VERSION}:*"):
+            await self.client.delete(key)
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    def stats(self) -> Dict:
+        return {"backend": "redis"}
+
+
+def create_cache_backend(env_prefix: str = "RECIPE_CACHE", default_backend: str = "memory",
+                         default_sqlite_path: str = "/tmp/pantrytoplate-cache.sqlite3") -> CacheBackend:
+    """Build the backend selected by ``<env_prefix>_BACKEND`` and its sibling settings.
+
+    Other shared state (e.g. batch jobs) reuses the backends under its own
+    prefix so it never competes with recipes for LRU slots.
+    """
+    backend = os.getenv(f"{env_prefix}_BACKEND", default_backend).strip().lower()
+    max_entries = int(os.getenv(f"{env_prefix}_MAX_ENTRIES", "1000"))
+    if backend == "memory":
+        return MemoryCacheBackend(max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteCacheBackend(os.getenv(f"{env_prefix}_SQLITE_PATH", default_sqlite_path), max_entries=max_entries)
+    if backend == "redis":
+        return RedisCacheBackend(os.getenv(f"{env_prefix}_REDIS_URL", "redis://localhost:6379/0"))
+    raise Exception(f"Unknown {env_prefix}_BACKEND: {backend}")
+
+
+class RecipeCache:
+    """Response cache for generated recipes keyed on the canonical request.
+
+    Backend failures are logged and treated as misses so the cache can never
+    take down recipe generation.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl_seconds: Optional[float] = None):
+        self.enabled = env_bool("RECIPE_CACHE_ENABLED", True)
+        self.backend = backend or create_cache_backend()
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("RECIPE_CACHE_TTL_SECONDS", "3600"))
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Recipe cache lookup failed: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict) -> None:
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Recipe cache store failed: {str(e)}")
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        try:
+            backend_stats = self.backend.stats()
+        except Exception as e:
+            backend_stats = {"error": str(e)}
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            **backend_stats,
+        }
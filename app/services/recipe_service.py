@@ -1,178 +1,326 @@
 import os
 import httpx
 import json
-import re
+import time
 import logging
-import certifi
-import ssl
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from .http_client import create_http_client
+from ..logging_config import LazyPayload
+from ..metrics import UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_LATENCY, record_tokens, timed, upstream_error_class
+from ..models import Recipe, RecipeResponse
+from .json_stream import IncrementalJSONScanner
+from .json_extract import parse_recipe_response
+from .resilience import RETRYABLE_STATUS_CODES, CircuitOpenError, UpstreamError, UpstreamGuard, parse_retry_after
+from .model_router import ModelConfig, ModelRouter
+from .prompt_builder import PromptBuilder, PromptOptions, restrict_sections
 
 logger = logging.getLogger(__name__)
 
 class RecipeService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, guard: Optional[UpstreamGuard] = None,
+                 router: Optional[ModelRouter] = None, prompts: Optional[PromptBuilder] = None):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
-        self.api_url = "https://openrouter.xyz/api/v1/chat/completions"
-        
-    async def generate_recipes(self, ingredients: List[str], dietary_restrictions: List[str]) -> Dict:
-        if not self.api_key:
-            logger.error("OpenRouter API key not found in environment variables")
-            raise Exception("OpenRouter API key not found in environment variables")
-            
-        prompt = self._create_prompt(ingredients, dietary_restrictions)
-        logger.info(f"Created prompt for ingredients: {ingredients}")
+        self.api_url = os.getenv("OPENROUTER_API_URL", "https://openrouter.xyz/api/v1/chat/completions")
+        self.client = client
+        self.guard = guard or UpstreamGuard()
+        self.router = router or ModelRouter()
+        self.prompts = prompts or PromptBuilder()
+
+    async def start(self) -> None:
+        """Open the pooled HTTP client. Called from the app lifespan."""
+        self._get_client()
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client and release its connections."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the service still works outside the app lifespan
+        if self.client is None:
+            self.client = create_http_client()
+        return self.client
         
+    def _build_request(self, ingredients: List[str], dietary_restrictions: List[str], model: ModelConfig,
+                       options: PromptOptions) -> Tuple[Dict, Dict]:
+        payload = self.prompts.build(ingredients, dietary_restrictions, options, model)
+        logger.debug("Created prompt for ingredients: %s", ingredients)
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "HTTP-Referer": "https://pantrytoplate-api.onrender.com",
             "Content-Type": "application/json"
         }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a helpful cooking assistant that creates recipes and meal plans. Always respond with valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-        
+        return headers, payload
+
+    async def generate_recipes(self, ingredients: List[str], dietary_restrictions: List[str],
+                               options: Optional[PromptOptions] = None) -> Dict:
+        options = options or PromptOptions()
+        if not self.api_key:
+            logger.error("OpenRouter API key not found in environment variables")
+            raise Exception("OpenRouter API key not found in environment variables")
+
+        last_error: Optional[Exception] = None
+        # Best model first by observed latency/errors/cost; the rest are fallbacks
+        for model in self.router.candidates():
+            headers, payload = self._build_request(ingredients, dietary_restrictions, model, options)
+
+            logger.info("Making request to OpenRouter API: %s (model %s)", self.api_url, model.name)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Headers: %s", LazyPayload({k: v for k, v in headers.items() if k != 'Authorization'}))
+                logger.debug("Payload: %s", LazyPayload(payload), extra={"payload": True})
+
+            started = time.monotonic()
+            try:
+                # Retries, rate limiting, circuit breaking and hedging happen in the guard
+                content = await self.guard.call(
+                    lambda headers=headers, payload=payload, model=model: self._request_completion(headers, payload, model),
+                    target=model.name
+                )
+            except CircuitOpenError as e:
+                UPSTREAM_ERRORS.inc(model.name, "circuit_open")
+                last_error = e
+                logger.warning("Model %s circuit is open, trying next model", model.name)
+                continue
+            except UpstreamError as e:
+                self.router.record(model, time.monotonic() - started, ok=False)
+                last_error = e
+                logger.warning("Model %s failed (%s), trying next model", model.name, str(e))
+                continue
+            try:
+                result = restrict_sections(self._parse_content(content, options), options)
+            except Exception as e:
+                # A completion we can't use is a model failure like any other
+                UPSTREAM_ERRORS.inc(model.name, "unparseable")
+                self.router.record(model, time.monotonic() - started, ok=False)
+                last_error = e
+                logger.warning("Model %s returned an unusable completion (%s), trying next model", model.name, str(e))
+                continue
+            self.router.record(model, time.monotonic() - started, ok=True)
+            return result
+
+        raise last_error
+
+    async def _request_completion(self, headers: Dict, payload: Dict, model: ModelConfig) -> str:
+        """Make one completion request and return the message content.
+
+        Failures are raised as UpstreamError so the guard can decide whether
+        they are worth retrying.
+        """
+        with timed(UPSTREAM_LATENCY, UPSTREAM_IN_FLIGHT, model.name, span="upstream"):
+            try:
+                return await self._send_completion(headers, payload, model)
+            except UpstreamError as e:
+                UPSTREAM_ERRORS.inc(model.name, upstream_error_class(e))
+                raise
+
+    async def _send_completion(self, headers: Dict, payload: Dict, model: ModelConfig) -> str:
+        client = self._get_client()
         try:
-            logger.info(f"Making request to OpenRouter API")
-            logger.info(f"URL: {self.api_url}")
-            logger.info(f"Headers: {json.dumps({k: v for k, v in headers.items() if k != 'Authorization'})}")
-            logger.info(f"Payload: {json.dumps(payload)}")
-            
-            # Create a custom SSL context that doesn't verify certificates
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
-                try:
-                    response = await client.post(
-                        self.api_url,
-                        headers=headers,
-                        json=payload,
-                        follow_redirects=True
-                    )
-                    
-                    logger.info(f"Response status code: {response.status_code}")
-                    logger.info(f"Response headers: {dict(response.headers)}")
-                    
-                    response_text = response.text
-                    logger.info(f"Raw response text: {response_text}")
-                    
-                    if not response_text:
-                        logger.error("Empty response received from API")
-                        raise Exception("Empty response received from API")
-                        
-                    if response.status_code == 200:
-                        try:
-                            result = response.json()
-                            logger.info(f"Parsed response JSON: {json.dumps(result)}")
-                            
-                            # Extract the content from the API response
-                            content = result['choices'][0]['message']['content']
-                            logger.info(f"Extracted content: {content}")
-                            
-                            # Parse the content as JSON
-                            try:
-                                recipes_data = json.loads(content)
-                                logger.info(f"Successfully parsed recipe data: {json.dumps(recipes_data)}")
-                                return recipes_data
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse recipe content as JSON: {str(e)}")
-                                # Try to extract JSON from the content if it's wrapped in markdown
-                                json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                                if json_match:
-                                    return json.loads(json_match.group(1))
-                                raise Exception(f"Failed to parse recipe data as JSON")
-                                
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to parse successful response as JSON: {str(e)}")
-                            logger.error(f"Response content: {response_text}")
-                            raise Exception(f"Invalid JSON in successful response: {str(e)}")
-                    else:
-                        try:
-                            error_detail = response.json() if response.content else response.text
-                            logger.error(f"API call failed with status {response.status_code}: {error_detail}")
-                            raise Exception(f"API call failed with status {response.status_code}: {error_detail}")
-                        except json.JSONDecodeError:
-                            logger.error(f"Failed to parse error response. Status: {response.status_code}, Content: {response.text}")
-                            raise Exception(f"API call failed with status {response.status_code} and unparseable response")
-                            
-                except httpx.RequestError as e:
-                    logger.error(f"Request failed: {str(e)}")
-                    raise Exception(f"Request failed: {str(e)}")
-                    
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                json=payload,
+                timeout=self._timeout_for(client, model)
+            )
         except httpx.TimeoutException:
             logger.error("Request to OpenRouter API timed out")
-            raise Exception("Request to OpenRouter API timed out")
-        except Exception as e:
-            logger.error(f"Unexpected error calling OpenRouter API: {str(e)}")
-            raise Exception(f"Error calling OpenRouter API: {str(e)}")
-    
-    def _create_prompt(self, ingredients: List[str], dietary_restrictions: List[str]) -> str:
-        return f"""Given these ingredients: {', '.join(ingredients)}
-        and dietary restrictions: {', '.join(dietary_restrictions)},
-        please provide:
-        1. 3 possible recipes that can be made
-        2. A weekly meal plan
-        3. A grocery shopping list
-        
-        Respond with ONLY a JSON object containing these keys:
-        - recipes: array of objects, each with 'name' and 'instructions'
-        - meal_plan: object with days of the week as keys
-        - grocery_list: array of strings
-        
-        Example format:
-        {{
-            "recipes": [
-                {{
-                    "name": "Recipe Name",
-                    "instructions": "Step by step instructions"
-                }}
-            ],
-            "meal_plan": {{
-                "Monday": "Recipe Name",
-                "Tuesday": "Another Recipe"
-            }},
-            "grocery_list": ["item 1", "item 2"]
-        }}
-        
-        Ensure the response is a valid JSON object without any markdown formatting or code blocks."""
-    
-    def _parse_response(self, content: str) -> Dict:
+            raise UpstreamError("Request to OpenRouter API timed out", status_code=504, retryable=True)
+        except httpx.RequestError as e:
+            logger.error(f"Request failed: {str(e)}")
+            raise UpstreamError(f"Request failed: {str(e)}", retryable=True)
+
+        logger.info("Response status code: %s", response.status_code)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response headers: %s", LazyPayload(dict(response.headers)))
+
+        response_text = response.text
+        logger.debug("Raw response text: %s", LazyPayload(response_text), extra={"payload": True})
+
+        if response.status_code != 200:
+            try:
+                error_detail = response.json() if response.content else response.text
+            except json.JSONDecodeError:
+                error_detail = LazyPayload(response_text, max_chars=500)
+            logger.error(f"API call failed with status {response.status_code}: {error_detail}")
+            raise UpstreamError(
+                f"API call failed with status {response.status_code}: {error_detail}",
+                upstream_status=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("retry-after")),
+                retryable=response.status_code in RETRYABLE_STATUS_CODES
+            )
+
+        if not response_text:
+            logger.error("Empty response received from API")
+            raise UpstreamError("Empty response received from API", upstream_status=200, retryable=True)
+
         try:
-            # First, try to parse as-is
-            logger.info("Attempting to parse API response as JSON")
-            return json.loads(content)
-        except json.JSONDecodeError:
+            result = response.json()
+            # Extract the content from the API response
+            content = result['choices'][0]['message']['content']
+            record_tokens(model.name, result.get('usage'))
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse successful response as JSON: {str(e)}")
+            logger.error("Response content: %s", LazyPayload(response_text))
+            raise UpstreamError(f"Invalid JSON in successful response: {str(e)}", upstream_status=200, retryable=True)
+        except (KeyError, IndexError, TypeError) as e:
+            logger.error(f"Unexpected response shape from API: {str(e)}")
+            raise UpstreamError(f"Unexpected response shape from API: {str(e)}", upstream_status=200, retryable=True)
+        logger.debug("Extracted content: %s", LazyPayload(content), extra={"payload": True})
+        return content
+
+    @staticmethod
+    def _timeout_for(client: httpx.AsyncClient, model: ModelConfig) -> httpx.Timeout:
+        # Per-model read timeout on top of the shared client's other timeouts
+        if model.timeout is None:
+            return client.timeout
+        return httpx.Timeout(
+            connect=client.timeout.connect,
+            read=model.timeout,
+            write=client.timeout.write,
+            pool=client.timeout.pool
+        )
+
+    def _parse_content(self, content: str, options: PromptOptions) -> Dict:
+        try:
+            recipes_data = parse_recipe_response(content, options.sections)
+        except ValueError as e:
+            logger.error(f"Failed to parse recipe content as JSON: {str(e)}")
+            raise Exception("Failed to parse recipe data as JSON")
+        logger.info("Successfully parsed recipe data with %d recipes", len(recipes_data['recipes']))
+        return recipes_data
+
+    @staticmethod
+    def _validated_event(event: str, model, data: Dict, field: Optional[str] = None) -> Optional[Dict]:
+        """Validate a streamed piece like the final parse does; pieces it would drop are not sent."""
+        try:
+            validated = model.parse_obj(data).dict()
+        except ValueError:
+            logger.warning("Skipping invalid streamed %s", event)
+            return None
+        return {"event": event, "data": validated[field] if field else validated}
+
+    async def stream_recipes(self, ingredients: List[str], dietary_restrictions: List[str],
+                             options: Optional[PromptOptions] = None) -> AsyncIterator[Dict]:
+        """Stream a recipe generation, yielding each section as soon as it is parseable.
+
+        Yields ``recipe`` events for every completed recipe, then ``meal_plan``
+        and ``grocery_list`` events, and finally a ``done`` event carrying the
+        assembled result.
+        """
+        if not self.api_key:
+            logger.error("OpenRouter API key not found in environment variables")
+            raise Exception("OpenRouter API key not found in environment variables")
+
+        options = options or PromptOptions()
+        last_error: Optional[Exception] = None
+        for model in self.router.candidates():
+            scanner = IncrementalJSONScanner()
+            emitted = False
+            started = time.monotonic()
             try:
-                logger.info("Initial JSON parsing failed, trying to extract JSON from response")
-                # Try to extract JSON from markdown code blocks
-                json_match = re.search(r'```(?:json)?\n(.*?)\n```', content, re.DOTALL)
-                if json_match:
-                    logger.info("Found JSON in code block")
-                    return json.loads(json_match.group(1))
-                
-                # If no code blocks, try to find just the JSON object
-                json_match = re.search(r'({.*})', content, re.DOTALL)
-                if json_match:
-                    logger.info("Found JSON object in content")
-                    return json.loads(json_match.group(1))
-                
-                logger.error("Could not find valid JSON in response")
-                raise Exception("Could not find valid JSON in response")
+                async for event in self._stream_model(ingredients, dietary_restrictions, model, options, scanner):
+                    emitted = True
+                    yield event
+            except UpstreamError as e:
+                if not isinstance(e, CircuitOpenError):
+                    self.router.record(model, time.monotonic() - started, ok=False)
+                # Once events reached the client we can't switch models mid-stream
+                if emitted:
+                    raise
+                last_error = e
+                logger.warning("Streaming with model %s failed (%s), trying next model", model.name, str(e))
+                continue
+
+            # The done payload is parsed from the whole text with the same repair and validation as
+            # generate_recipes, rather than from whichever streamed values happened to parse
+            try:
+                result = restrict_sections(self._parse_content(scanner.text, options), options)
             except Exception as e:
-                logger.error(f"Failed to parse API response: {str(e)}")
-                logger.error(f"Raw content: {content}")
-                raise Exception(f"Failed to parse API response: {str(e)}, Content: {content}") 
\ No newline at end of file
+                UPSTREAM_ERRORS.inc(model.name, "unparseable")
+                self.router.record(model, time.monotonic() - started, ok=False)
+                if emitted:
+                    raise
+                last_error = e
+                logger.warning("Model %s streamed an unusable completion (%s), trying next model", model.name, str(e))
+                continue
+            self.router.record(model, time.monotonic() - started, ok=True)
+            yield {"event": "done", "data": result}
+            return
+
+        raise last_error
+
+    async def _stream_model(self, ingredients: List[str], dietary_restrictions: List[str], model: ModelConfig,
+                            options: PromptOptions, scanner: IncrementalJSONScanner) -> AsyncIterator[Dict]:
+        headers, payload = self._build_request(ingredients, dietary_restrictions, model, options)
+        payload["stream"] = True
+
+        logger.info("Making streaming request to OpenRouter API: %s (model %s)", self.api_url, model.name)
+        client = self._get_client()
+        # Streams cannot be retried once bytes are forwarded, so only one guarded attempt
+        async with self.guard.attempt(model.name):
+            with timed(UPSTREAM_LATENCY, UPSTREAM_IN_FLIGHT, model.name):
+                try:
+                    async for event in self._read_stream(client, headers, payload, model, options, scanner):
+                        yield event
+                except UpstreamError as e:
+                    UPSTREAM_ERRORS.inc(model.name, upstream_error_class(e))
+                    raise
+
+    async def _read_stream(self, client: httpx.AsyncClient, headers: Dict, payload: Dict, model: ModelConfig,
+                           options: PromptOptions, scanner: IncrementalJSONScanner) -> AsyncIterator[Dict]:
+        recipes_sent = 0
+        try:
+            async with client.stream("POST", self.api_url, headers=headers, json=payload,
+                                     timeout=self._timeout_for(client, model)) as response:
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode("utf-8", errors="replace")
+                    logger.error(f"Streaming API call failed with status {response.status_code}: {error_text}")
+                    raise UpstreamError(
+                        f"API call failed with status {response.status_code}: {error_text}",
+                        upstream_status=response.status_code,
+                        retry_after=parse_retry_after(response.headers.get("retry-after")),
+                        retryable=response.status_code in RETRYABLE_STATUS_CODES
+                    )
+
+                async for line in response.aiter_lines():
+                    # SSE frames look like "data: {...}"; comments and keep-alives are skipped
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping malformed stream chunk: %s", LazyPayload(data, max_chars=500))
+                        continue
+                    # Providers report usage on the final chunk
+                    record_tokens(model.name, chunk.get("usage"))
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if not delta:
+                        continue
+                    for kind, key, value in scanner.feed(delta):
+                        if key not in options.sections:
+                            continue
+                        if kind == "element" and key == "recipes":
+                            # Same cap restrict_sections applies to the done payload
+                            if recipes_sent >= options.num_recipes:
+                                continue
+                            event = self._validated_event("recipe", Recipe, value)
+                            if event is not None:
+                                recipes_sent += 1
+                        elif kind == "value" and key in ("meal_plan", "grocery_list"):
+                            event = self._validated_event(key, RecipeResponse, {key: value}, key)
+                        else:
+                            continue
+                        if event is not None:
+                            yield event
+        except httpx.TimeoutException:
+            logger.error("Streaming request to OpenRouter API timed out")
+            raise UpstreamError("Request to OpenRouter API timed out", status_code=504, retryable=True)
+        except httpx.RequestError as e:
+            logger.error(f"Streaming request failed: {str(e)}")
+            raise UpstreamError(f"Request failed: {str(e)}", retryable=True)
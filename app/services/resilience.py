@@ -0,0 +1,322 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from ..config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """A failed call to an upstream provider.
+
+    ``status_code`` is the status this API should answer with, while
+    ``upstream_status`` is what the provider returned (if anything).
+    """
+
+    def __init__(self, message: str, status_code: int = 502, upstream_status: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.upstream_status = upstream_status
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, retry_after: float):
+        super().__init__("Upstream circuit is open, failing fast", status_code=503, retry_after=retry_after)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursting up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise UpstreamError("Upstream rate limit exceeded, try again later", status_code=503, retry_after=wait)
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures; probe again after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        if self.state == "closed":
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            # Let a single probe through; everyone else keeps failing fast
+            self._probe_in_flight = True
+            return
+        raise CircuitOpenError(retry_after=max(remaining, 1.0))
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Upstream circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.error(f"Upstream circuit opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """Rolling window of recent latencies used to pick the hedging delay."""
+
+    def __init__(self, size: int = 200):
+        self.samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class UpstreamGuard:
+    """Concurrency/rate limiting, retries, circuit breaking and hedging for upstream calls.
+
+    ``call`` runs a coroutine factory with all protections. ``attempt`` is the
+    single-shot variant for calls that cannot be retried (e.g. streaming).
+    """
+
+    def __init__(self, name: str = "openrouter"):
+        self.name = name
+        self.max_concurrency = env_int("OPENROUTER_MAX_CONCURRENCY", 32)
+        self.queue_timeout = env_float("OPENROUTER_QUEUE_TIMEOUT", 10.0)
+        rate = env_float("OPENROUTER_RATE_LIMIT_RPS", 0.0)
+        self.bucket = TokenBucket(rate, env_float("OPENROUTER_RATE_LIMIT_BURST", max(rate, 1.0))) if rate > 0 else None
+
+        self.max_attempts = env_int("OPENROUTER_MAX_ATTEMPTS", 3)
+        self.retry_base_delay = env_float("OPENROUTER_RETRY_BASE_DELAY", 0.5)
+        self.retry_max_delay = env_float("OPENROUTER_RETRY_MAX_DELAY", 8.0)
+
+        # One breaker per upstream target (e.g. per model) so one bad target doesn't block the rest
+        self.breaker_failures = env_int("OPENROUTER_BREAKER_FAILURES", 5)
+        self.breaker_reset = env_float("OPENROUTER_BREAKER_RESET_SECONDS", 30.0)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        self.hedge_enabled = env_bool("OPENROUTER_HEDGE_ENABLED", False)
+        self.hedge_percentile = env_float("OPENROUTER_HEDGE_PERCENTILE", 0.95)
+        self.hedge_min_delay = env_float("OPENROUTER_HEDGE_MIN_DELAY", 1.0)
+        self.hedge_min_samples = env_int("OPENROUTER_HEDGE_MIN_SAMPLES", 20)
+        self.latencies: Dict[str, LatencyWindow] = {}
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamError("Too many concurrent upstream requests, try again later", status_code=503, retry_after=1.0)
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire(self.queue_timeout)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def breaker(self, target: str = "default") -> CircuitBreaker:
+        breaker = self.breakers.get(target)
+        if breaker is None:
+            breaker = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            self.breakers[target] = breaker
+        return breaker
+
+    @asynccontextmanager
+    async def attempt(self, target: str = "default") -> AsyncIterator[None]:
+        """Guard one upstream attempt with the target's circuit breaker and the limiters."""
+        breaker = self.breaker(target)
+        breaker.before_call()
+        provider_ok: Optional[bool] = None
+        try:
+            async with self._slot():
+                try:
+                    yield
+                except UpstreamError as e:
+                    # A non-retryable answer (e.g. 400) still proves the provider is up
+                    provider_ok = not e.retryable
+                    raise
+                except Exception:
+                    # The provider answered; the failure happened on our side
+                    provider_ok = True
+                    raise
+                provider_ok = True
+        finally:
+            if provider_ok is True:
+                breaker.record_success()
+            elif provider_ok is False:
+                breaker.record_failure()
+            else:
+                # Cancelled or rejected locally: no evidence either way
+                breaker.release_probe()
+
+    def _latencies(self, target: str) -> LatencyWindow:
+        window = self.latencies.get(target)
+        if window is None:
+            window = self.latencies[target] = LatencyWindow()
+        return window
+
+    async def _timed_attempt(self, fn: Callable[[], Awaitable[Any]], target: str) -> Any:
+        async with self.attempt(target):
+            started = time.monotonic()
+            result = await fn()
+        self._latencies(target).add(time.monotonic() - started)
+        return result
+
+    def _hedge_delay(self, target: str) -> Optional[float]:
+        window = self._latencies(target)
+        if not self.hedge_enabled or len(window.samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, window.percentile(self.hedge_percentile))
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]], target: str) -> Any:
+        delay = self._hedge_delay(target)
+        primary = asyncio.ensure_future(self._timed_attempt(fn, target))
+        tasks = [primary]
+        try:
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            # Primary is slower than the usual tail: race a second request against it
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._timed_attempt(fn, target))
+            tasks.append(hedge)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], target: str = "default") -> Any:
+        """Run ``fn`` against ``target`` with retries (exponential backoff, full jitter, Retry-After aware)."""
+        self.calls += 1
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await self._hedged(fn, target)
+            except CircuitOpenError:
+                self.failures += 1
+                raise
+            except UpstreamError as e:
+                if not e.retryable or attempt == self.max_attempts:
+                    self.failures += 1
+                    raise
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempt - 1))))
+                if e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.retry_max_delay))
+                self.retries += 1
+                logger.warning("Upstream attempt %d failed (%s), retrying in %.2fs", attempt, e, delay)
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "targets": {
+                target: {
+                    "circuit_state": breaker.state,
+                    "circuit_opened": breaker.times_opened,
+                    "p95_latency_ms": round((self._latencies(target).percentile(0.95) or 0.0) * 1000, 1),
+                }
+                for target, breaker in self.breakers.items()
+            },
+        }
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one upstream call.
+
+    The first caller for a key starts the work as a task; every concurrent
+    caller for that key awaits the same task and receives the same result or
+    exception. A cancelled caller only stops waiting: the shared call keeps
+    running for the others and is cancelled only when nobody waits for it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        call = self._calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+        else:
+            self.collapsed += 1
+            logger.info("Joining in-flight call for key: %s", key)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Forget it now rather than in the done callback, so a caller arriving
+                # while the task unwinds starts a fresh call instead of joining a cancelled one
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Retrieve the exception so an abandoned failed call is not reported as never retrieved
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..config import env_bool
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(value) -> str:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+class _UserEntry:
+    def __init__(self):
+        self.version = 0
+        self.pages: Dict[str, Dict] = {}
+        self.expires_at: Dict[str, float] = {}
+
+
+class UserDataCache:
+    """Per-user read-through cache for history and favorites pages.
+
+    Entries are grouped by ``(kind, user_id)`` so a write invalidates every
+    cached page for that user at once. Each group carries a version number:
+    a read that started before an invalidation cannot store its (now stale)
+    result afterwards. The cache is per process and invalidation only reaches
+    the worker that handled the write, so it turns itself off when
+    ``WEB_CONCURRENCY`` runs more than one worker.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_users: Optional[int] = None):
+        self.enabled = env_bool("USER_CACHE_ENABLED", True)
+        workers = int(os.getenv("WEB_CONCURRENCY") or "1")
+        if self.enabled and workers > 1:
+            logger.warning("User cache disabled: invalidation is per process and WEB_CONCURRENCY=%d", workers)
+            self.enabled = False
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+        self.max_users = max_users or int(os.getenv("USER_CACHE_MAX_USERS", "10000"))
+        self._entries: "OrderedDict[tuple, _UserEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _entry(self, kind: str, user_id: str) -> _UserEntry:
+        key = (kind, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _UserEntry()
+            self._entries[key] = entry
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, kind: str, user_id: str, params_key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get((kind, user_id))
+        page = entry.pages.get(params_key) if entry is not None else None
+        if page is None or entry.expires_at[params_key] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end((kind, user_id))
+        self.hits += 1
+        return page
+
+    def version(self, kind: str, user_id: str) -> int:
+        """Snapshot to pass back to ``set`` once the read completes."""
+        return self._entry(kind, user_id).version
+
+    def set(self, kind: str, user_id: str, params_key: str, page: Dict, version: int) -> Dict:
+        """Store a freshly read page and return it with its ``etag`` filled in."""
+        page = {**page, "etag": compute_etag(page)}
+        if not self.enabled:
+            return page
+        entry = self._entry(kind, user_id)
+        if entry.version == version:
+            entry.pages[params_key] = page
+            entry.expires_at[params_key] = time.monotonic() + self.ttl_seconds
+        return page
+
+    def invalidate(self, kind: str, user_id: str) -> None:
+        entry = self._entries.get((kind, user_id))
+        if entry is None:
+            return
+        entry.version += 1
+        entry.pages.clear()
+        entry.expires_at.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "users": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,89 @@
+"""Throughput of batch generation against the fake OpenRouter.
+
+Compares generating N pantries one request at a time (what partner
+integrations did with /generate-recipe) with BatchService at several
+concurrency limits.
+
+    python -m benchmarks.bench_batch --requests 100 --latency 0.1
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from app.models import RecipeRequest
+from app.services.batch_service import BatchService
+from app.services.model_router import ModelConfig, ModelRouter
+from app.services.recipe_service import RecipeService
+from benchmarks.fake_openrouter import create_fake_openrouter
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.inserts = 0
+
+    async def save_recipe_history_batch(self, entries: List[Tuple[str, Dict]]) -> List[Dict]:
+        self.inserts += 1
+        return []
+
+
+def _service(latency: float) -> RecipeService:
+    fake = create_fake_openrouter({"bench-model": (latency, 0.0)})
+    service = RecipeService(client=httpx.AsyncClient(app=fake, base_url="http://fake"),
+                            router=ModelRouter([ModelConfig("bench-model")]))
+    service.api_key = "bench"
+    service.api_url = "http://fake/api/v1/chat/completions"
+    service.guard.max_concurrency = 256
+    return service
+
+
+def _requests(count: int, duplicates: float) -> List[RecipeRequest]:
+    unique = max(1, int(count * (1 - duplicates)))
+    return [RecipeRequest(ingredients=[f"ingredient {i % unique}", "rice"], dietary_restrictions=[], user_id="bench")
+            for i in range(count)]
+
+
+async def _sequential(requests: List[RecipeRequest], latency: float) -> float:
+    service = _service(latency)
+    started = time.perf_counter()
+    for request in requests:
+        await service.generate_recipes(request.ingredients, request.dietary_restrictions)
+    elapsed = time.perf_counter() - started
+    await service.aclose()
+    return elapsed
+
+
+async def _batched(requests: List[RecipeRequest], latency: float, concurrency: int) -> Tuple[float, int]:
+    service = _service(latency)
+    supabase = FakeSupabase()
+    batch = BatchService(lambda request: service.generate_recipes(request.ingredients, request.dietary_restrictions),
+                         supabase, max_concurrency=concurrency, max_requests=len(requests))
+    started = time.perf_counter()
+    await batch.run(requests)
+    elapsed = time.perf_counter() - started
+    await service.aclose()
+    return elapsed, supabase.inserts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of requests repeating another pantry")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    requests = _requests(args.requests, args.duplicates)
+    elapsed = asyncio.run(_sequential(requests, args.latency))
+    print(f"{'one by one':18} {elapsed:7.2f} s  {args.requests / elapsed:8.1f} pantries/s")
+    for concurrency in (1, 4, 16, 64):
+        elapsed, inserts = asyncio.run(_batched(requests, args.latency, concurrency))
+        print(f"{'batch, c=' + str(concurrency):18} {elapsed:7.2f} s  {args.requests / elapsed:8.1f} pantries/s  "
+              f"({inserts} history inserts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Parse rate and speed of the completion JSON extractor.
+
+Runs a corpus of malformed completions as seen from real models (markdown
+fences, chatty preambles, trailing commas, raw newlines in strings,
+outputs cut off by max_tokens) through the previous parsing path and
+through ``parse_recipe_response``.
+
+    python -m benchmarks.bench_json_extract --repeat 200
+"""
+import argparse
+import json
+import logging
+import re
+import time
+from typing import Callable, Dict
+
+from app.models import RecipeResponse
+from app.services.json_extract import orjson, parse_recipe_response
+
+
+def _document(recipes: int = 3, steps: int = 8) -> Dict:
+    return {
+        "recipes": [
+            {"name": f"Recipe {i}", "instructions": " ".join(f"Step {n}: chop, stir and simmer {{gently}}." for n in range(steps))}
+            for i in range(recipes)
+        ],
+        "meal_plan": {day: f"Recipe {i % recipes}" for i, day in enumerate(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])},
+        "grocery_list": [f"item {i}" for i in range(20)],
+    }
+
+
+def build_corpus() -> Dict[str, str]:
+    clean = json.dumps(_document(), indent=2)
+    large = json.dumps(_document(recipes=10, steps=60), indent=2)
+    trailing = clean.replace('"\n    }', '",\n    }').replace('}\n  ],', '},\n  ],').replace('"item 19"', '"item 19",')
+    return {
+        "clean": clean,
+        "clean, large": large,
+        "fenced": f"```json\n{clean}\n```",
+        "fenced without language": f"```\n{clean}\n```",
+        "preamble and epilogue": f"Sure! Here are some recipes for you:\n\n{clean}\n\nEnjoy your meals! Let me know if you need more {{ideas}}.",
+        "trailing commas": trailing,
+        "raw newlines in strings": clean.replace("Step 3:", "\nStep 3:"),
+        "truncated in grocery list": clean[:clean.index('"item 12"') + 5],
+        "truncated after a complete item": clean[:clean.index('"item 12"') + len('"item 12"')],
+        "truncated in last recipe": json.dumps({"recipes": _document()["recipes"], "grocery_list": ["rice"], "meal_plan": {}}, indent=2)[:900],
+        "fenced and truncated": f"```json\n{large}"[:len(large) - 200],
+        "fenced, trailing commas and epilogue": f"```json\n{trailing}\n```\nHope this helps!",
+    }
+
+
+def legacy_parse(content: str) -> Dict:
+    """The parsing path before the extractor (json.loads, fenced-block regex, greedy object regex),
+    followed by the RecipeResponse validation the endpoint applied afterwards."""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        json_match = re.search(r'```(?:json)?\n(.*?)\n```', content, re.DOTALL)
+        if not json_match:
+            json_match = re.search(r'({.*})', content, re.DOTALL)
+        if not json_match:
+            raise Exception("Could not find valid JSON in response")
+        data = json.loads(json_match.group(1))
+    return RecipeResponse.parse_obj(data).dict()
+
+
+def _run(parse: Callable[[str], Dict], content: str, repeat: int):
+    try:
+        result = parse(content)
+    except Exception:
+        return False, None, None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+    return True, (time.perf_counter() - started) / repeat * 1e6, len(result['recipes'])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"orjson: {'installed' if orjson is not None else 'not installed'}")
+    print(f"{'case':38} {'chars':>6} {'legacy':>14} {'extractor':>20}")
+    legacy_ok = extractor_ok = 0
+    corpus = build_corpus()
+    for name, content in corpus.items():
+        ok_old, us_old, _ = _run(legacy_parse, content, args.repeat)
+        ok_new, us_new, recipes = _run(parse_recipe_response, content, args.repeat)
+        legacy_ok += ok_old
+        extractor_ok += ok_new
+        old = f"{us_old:8.1f} us" if ok_old else "failed"
+        new = f"{us_new:8.1f} us ({recipes} r)" if ok_new else "failed"
+        print(f"{name:38} {len(content):6d} {old:>14} {new:>20}")
+    print(f"parsed: legacy {legacy_ok}/{len(corpus)}, extractor {extractor_ok}/{len(corpus)}")
+
+    # Unparseable either way; shows the greedy ``({.*})`` regex going quadratic on a long unclosed output
+    garbage = "Here is the plan: " + '{"recipes": [' + '{"name": "x", ' * 4000
+    for name, parse in (("legacy", legacy_parse), ("extractor", parse_recipe_response)):
+        started = time.perf_counter()
+        try:
+            parse(garbage)
+        except Exception:
+            pass
+        print(f"unclosed {len(garbage)}-char output, {name}: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
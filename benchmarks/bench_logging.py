@@ -0,0 +1,95 @@
+"""Logging overhead on the /generate-recipe hot path.
+
+Runs RecipeService.generate_recipes against an in-process mock of
+OpenRouter under several logging configurations and reports CPU time and
+log bytes written per request.
+
+    python -m benchmarks.bench_logging --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+from app.logging_config import configure_logging
+from app.services.recipe_service import RecipeService
+
+SCENARIOS = [
+    # Roughly the previous behaviour: every payload dumped in full
+    ("full payload dumps", {"LOG_LEVEL": "DEBUG", "LOG_FORMAT": "text", "LOG_PAYLOAD_MAX_CHARS": "0", "LOG_PAYLOAD_SAMPLE_RATE": "1"}),
+    ("debug, truncated+sampled", {"LOG_LEVEL": "DEBUG", "LOG_FORMAT": "text", "LOG_PAYLOAD_MAX_CHARS": "500", "LOG_PAYLOAD_SAMPLE_RATE": "0.1"}),
+    ("info (default)", {"LOG_LEVEL": "INFO", "LOG_FORMAT": "text"}),
+    ("info, json", {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json"}),
+    ("warning", {"LOG_LEVEL": "WARNING", "LOG_FORMAT": "text"}),
+]
+
+
+class CountingStream:
+    """Sink for log output that only counts bytes."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _completion() -> dict:
+    recipes = [
+        {"name": f"Recipe {i}", "instructions": " ".join(f"Step {n}: chop, stir and simmer the ingredients." for n in range(12))}
+        for i in range(3)
+    ]
+    content = json.dumps({
+        "recipes": recipes,
+        "meal_plan": {day: f"Recipe {i % 3}" for i, day in enumerate(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])},
+        "grocery_list": [f"item {i}" for i in range(25)],
+    })
+    return {"id": "bench", "choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+async def _run(requests: int) -> float:
+    body = json.dumps(_completion()).encode("utf-8")
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body, headers={"content-type": "application/json"}))
+    service = RecipeService(client=httpx.AsyncClient(transport=transport))
+    service.api_key = "bench"
+    started = time.process_time()
+    for _ in range(requests):
+        await service.generate_recipes(["chicken", "rice", "tomatoes"], ["gluten-free"])
+    elapsed = time.process_time() - started
+    await service.aclose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    real_stderr = sys.stderr
+    results = []
+    for name, env in SCENARIOS:
+        os.environ.update(env)
+        sink = CountingStream()
+        sys.stderr = sink
+        try:
+            configure_logging()
+            cpu = asyncio.run(_run(args.requests))
+        finally:
+            sys.stderr = real_stderr
+        results.append((name, cpu / args.requests * 1e6, sink.bytes / args.requests))
+
+    print(f"{'scenario':28} {'cpu us/req':>12} {'log bytes/req':>14}")
+    for name, cpu_us, log_bytes in results:
+        print(f"{name:28} {cpu_us:12.1f} {log_bytes:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Metrics overhead on the request path.
+
+Sends requests through ``MetricsMiddleware`` to a trivial route and times the
+upstream/database helpers, with metrics off, on, and on with Server-Timing,
+and reports CPU time per request (best of ``--rounds``, scenarios interleaved
+so warm-up and noise don't favour one of them).
+
+    python -m benchmarks.bench_metrics --requests 5000 --rounds 3
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import app.metrics as metrics
+from app.metrics import DB_IN_FLIGHT, DB_LATENCY, MetricsMiddleware, timed
+
+SCENARIOS = [
+    ("metrics off", {"ENABLED": False, "SERVER_TIMING": False}),
+    ("metrics on", {"ENABLED": True, "SERVER_TIMING": False}),
+    ("metrics on, server-timing", {"ENABLED": True, "SERVER_TIMING": True}),
+]
+
+
+def _create_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        # Roughly what a history read records: one timed database call
+        with timed(DB_LATENCY, DB_IN_FLIGHT, "read_history", span="db_read_history"):
+            pass
+        return {"item_id": item_id}
+
+    return app
+
+
+async def _run(requests: int) -> float:
+    async with httpx.AsyncClient(app=_create_app(), base_url="http://bench") as client:
+        await client.get("/items/warmup")
+        started = time.process_time()
+        for i in range(requests):
+            await client.get(f"/items/{i}")
+        return time.process_time() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    best = {name: float("inf") for name, _ in SCENARIOS}
+    for _ in range(args.rounds):
+        for name, flags in SCENARIOS:
+            for flag, value in flags.items():
+                setattr(metrics, flag, value)
+            best[name] = min(best[name], asyncio.run(_run(args.requests)))
+    results = [(name, cpu / args.requests * 1e6) for name, cpu in best.items()]
+
+    started = time.perf_counter()
+    metrics.REGISTRY.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    baseline = results[0][1]
+    print(f"{'scenario':28} {'cpu us/req':>12} {'overhead us':>12}")
+    for name, cpu_us in results:
+        print(f"{name:28} {cpu_us:12.1f} {cpu_us - baseline:12.1f}")
+    print(f"/metrics render: {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Latency of /generate-recipe generation with model routing and fallback.
+
+Runs RecipeService against the in-process fake OpenRouter with a pool of
+one slow, one fast and one flaky model, and compares routing with the
+previous behaviour of always calling the first configured model.
+
+    python -m benchmarks.bench_model_routing --requests 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import List
+
+import httpx
+
+from app.services.model_router import ModelConfig, ModelRouter
+from app.services.recipe_service import RecipeService
+from benchmarks.fake_openrouter import create_fake_openrouter
+
+PROFILES = {"slow-model": (0.4, 0.0), "fast-model": (0.05, 0.0), "flaky-model": (0.02, 0.5)}
+
+
+class PinnedRouter(ModelRouter):
+    """Baseline: always the first configured model, no fallback."""
+
+    def candidates(self) -> List[ModelConfig]:
+        return self.models[:1]
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run(router: ModelRouter, requests: int, concurrency: int) -> dict:
+    fake = create_fake_openrouter(PROFILES)
+    service = RecipeService(client=httpx.AsyncClient(app=fake, base_url="http://fake"), router=router)
+    service.api_key = "bench"
+    service.api_url = "http://fake/api/v1/chat/completions"
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await service.generate_recipes(["chicken", "rice"], [])
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    await service.aclose()
+    return {
+        "p50": _percentile(latencies, 0.5) * 1000,
+        "p95": _percentile(latencies, 0.95) * 1000,
+        "failures": failures,
+        "calls": dict(fake.state.calls),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    # Keep retries quick so the numbers reflect routing rather than backoff
+    os.environ.setdefault("OPENROUTER_RETRY_BASE_DELAY", "0.01")
+    os.environ.setdefault("OPENROUTER_MAX_ATTEMPTS", "1")
+
+    pool = [ModelConfig(name) for name in PROFILES]
+    for name, router in (("pinned first model", PinnedRouter(pool)), ("routed pool", ModelRouter(pool))):
+        result = asyncio.run(_run(router, args.requests, args.concurrency))
+        print(f"{name:20} p50 {result['p50']:7.1f} ms  p95 {result['p95']:7.1f} ms  "
+              f"failures {result['failures']:3d}  calls {result['calls']}")
+
+
+if __name__ == "__main__":
+    main()
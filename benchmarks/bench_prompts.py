@@ -0,0 +1,81 @@
+"""Prompt size, output size and latency per prompt variant.
+
+Runs RecipeService against the fake OpenRouter, which answers with roughly
+what the prompt asks for (sections, recipe count, meal-plan days, minified
+or indented JSON) and takes longer per generated token, like a real model.
+
+    python -m benchmarks.bench_prompts --requests 10 --token-latency 0.002
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from typing import Dict
+
+import httpx
+
+from app.services.model_router import ModelConfig, ModelRouter
+from app.services.prompt_builder import PromptBuilder, PromptOptions
+from app.services.recipe_service import RecipeService
+from benchmarks.fake_openrouter import create_fake_openrouter
+
+VARIANTS = [
+    ("verbose prompt (before)", {"PROMPT_STYLE": "verbose"}, {}),
+    ("compact prompt", {}, {}),
+    ("compact, JSON mode", {"PROMPT_JSON_MODE": "true"}, {}),
+    ("recipes only", {}, {"sections": ["recipes"]}),
+    ("1 recipe, 3-day plan", {}, {"num_recipes": 1, "meal_plan_days": 3}),
+]
+
+INGREDIENTS = [f"ingredient {i}" for i in range(50)]
+
+
+async def _run(env: Dict, options: Dict, requests: int, token_latency: float) -> Dict:
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        prompts = PromptBuilder()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    fake = create_fake_openrouter({"bench-model": (0.05, 0.0)}, token_latency=token_latency)
+    service = RecipeService(client=httpx.AsyncClient(app=fake, base_url="http://fake"),
+                            router=ModelRouter([ModelConfig("bench-model")]), prompts=prompts)
+    service.api_key = "bench"
+    service.api_url = "http://fake/api/v1/chat/completions"
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await service.generate_recipes(INGREDIENTS, ["vegetarian"], PromptOptions(**options))
+        latencies.append(time.perf_counter() - started)
+    await service.aclose()
+    return {
+        "prompt_tokens": statistics.mean(usage["prompt_tokens"] for usage in fake.state.usage),
+        "completion_tokens": statistics.mean(usage["completion_tokens"] for usage in fake.state.usage),
+        "max_tokens": prompts.max_tokens(PromptOptions(**options), ModelConfig("bench-model")) if prompts.style != "verbose" else 2000,
+        "p50_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per generated token")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{'variant':26} {'tokens in':>10} {'tokens out':>11} {'max_tokens':>11} {'p50 ms':>8}")
+    for name, env, options in VARIANTS:
+        result = asyncio.run(_run(env, options, args.requests, args.token_latency))
+        print(f"{name:26} {result['prompt_tokens']:10.0f} {result['completion_tokens']:11.0f} "
+              f"{result['max_tokens']:11d} {result['p50_ms']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Cold start of the backend.
+
+Measures, over fresh processes (median of ``--runs``):
+
+    import      python -c "import app.main"
+    listening   process start until /health answers
+    ready       process start until /health/ready answers 200 (same as listening when it doesn't exist)
+    first req   latency of the first /recipe-history request, against the fake Supabase
+    second req  latency of the next one, for comparison
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import _free_port, _start, _stop
+
+
+def measure_import() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def _wait_for(client: httpx.Client, path: str, timeout: float = 30.0) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return client.get(path).status_code
+        except httpx.TransportError:
+            time.sleep(0.005)
+    raise RuntimeError(f"{path} did not answer within {timeout}s")
+
+
+def measure_server(database_url: str) -> Dict[str, float]:
+    port = _free_port()
+    env = {**os.environ, "SUPABASE_URL": database_url, "SUPABASE_KEY": "bench", "LOG_LEVEL": "WARNING"}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--ws", "none", "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30.0) as client:
+            _wait_for(client, "/health")
+            listening = time.perf_counter() - started
+            while True:
+                status = _wait_for(client, "/health/ready")
+                if status != 503:
+                    break
+                time.sleep(0.005)
+            ready = time.perf_counter() - started
+
+            requests = []
+            for _ in range(2):
+                request_started = time.perf_counter()
+                client.get("/recipe-history/user-0").raise_for_status()
+                requests.append(time.perf_counter() - request_started)
+    finally:
+        _stop([process])
+    return {"listening": listening, "ready": ready, "first req": requests[0], "second req": requests[1]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    database_port = _free_port()
+    database = _start([sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(database_port),
+                       "--seed-users", "1", "--seed-rows", "20"], {}, database_port)
+    try:
+        samples: Dict[str, List[float]] = {"import": []}
+        for _ in range(args.runs):
+            samples["import"].append(measure_import())
+            for name, seconds in measure_server(f"http://127.0.0.1:{database_port}").items():
+                samples.setdefault(name, []).append(seconds)
+    finally:
+        _stop([database])
+
+    print(f"{'phase':12} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for name, values in samples.items():
+        print(f"{name:12} {statistics.median(values) * 1000:10.1f} {min(values) * 1000:10.1f} {max(values) * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Concurrency benchmark for SupabaseService against a slow fake database.
+
+Compares the thread-pool offload in SupabaseService with the previous
+behaviour of calling the synchronous client directly on the event loop.
+
+    python -m benchmarks.bench_supabase_concurrency --requests 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+from httpx import QueryParams
+
+from app.services.supabase_service import SupabaseService
+from app.services.user_cache import UserDataCache
+
+
+class FakeResponse:
+    def __init__(self, data: List):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable stand-in for a PostgREST query whose execute() blocks."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        # Keyset pagination edits the query string directly
+        self.params = QueryParams()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self) -> FakeResponse:
+        time.sleep(self.latency)
+        return FakeResponse([{"id": "1", "user_id": "bench"}])
+
+
+class FakeClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self.latency)
+
+
+class BlockingSupabaseService(SupabaseService):
+    """Baseline: executes queries inline, blocking the event loop."""
+
+    async def _execute(self, query, operation="query"):
+        return query.execute()
+
+
+async def _measure(service: SupabaseService, requests: int) -> dict:
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        # How late does a 10ms timer fire while queries are running?
+        while not stop.is_set():
+            expected = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    ticker = asyncio.ensure_future(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(service.get_recipe_history("bench") for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    await service.aclose()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "max_loop_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated DB round trip in seconds")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for name, cls in (("blocking (before)", BlockingSupabaseService), ("offloaded (after)", SupabaseService)):
+        # Every read must reach the fake database, so the per-user read cache is off
+        cache = UserDataCache()
+        cache.enabled = False
+        result = await _measure(cls(client=FakeClient(args.latency), cache=cache), args.requests)
+        print(f"{name:20} {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
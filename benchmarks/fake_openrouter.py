@@ -0,0 +1,135 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Simulates per-model latency and error rates so routing, fallback and the
+resilience layer can be exercised without network access. Run it as a
+server and point the backend at it:
+
+    python -m benchmarks.fake_openrouter --port 9000 \
+        --model fast=0.05 --model slow=1.5 --model flaky=0.1:0.3
+    OPENROUTER_API_URL=http://localhost:9000/api/v1/chat/completions \
+        OPENROUTER_MODELS=slow,fast,flaky uvicorn app.main:app
+
+or mount ``create_fake_openrouter()`` in-process with ``httpx.AsyncClient(app=...)``.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from typing import Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# model name -> (latency seconds, error rate)
+ModelProfiles = Dict[str, Tuple[float, float]]
+
+
+def sample_content(recipes: int = 3, meal_plan_days: int = 3, grocery_list: bool = True, indent: Optional[int] = None) -> str:
+    document = {}
+    if recipes:
+        document["recipes"] = [
+            {"name": f"Recipe {i}", "instructions": " ".join(f"Step {n}: chop, stir and simmer the ingredients." for n in range(1, 9))}
+            for i in range(recipes)
+        ]
+    if meal_plan_days:
+        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"][:meal_plan_days]
+        document["meal_plan"] = {day: f"Recipe {i % max(recipes, 1)}" for i, day in enumerate(days)}
+    if grocery_list:
+        document["grocery_list"] = ["onion", "garlic", "olive oil"]
+    return json.dumps(document, indent=indent)
+
+
+def content_for(payload: Dict) -> str:
+    """Roughly follow the prompt: requested sections, recipe count and days, minified or indented."""
+    system, prompt = (message["content"] for message in payload["messages"][:2])
+    recipes = re.search(r"\((\d+) recipes\)", prompt)
+    days = re.search(r"\(days: ([^)]*)\)", prompt)
+    return sample_content(
+        recipes=(int(recipes.group(1)) if recipes else 3) if "recipes" in prompt else 0,
+        meal_plan_days=(len(days.group(1).split(",")) if days else 7) if "meal_plan" in prompt else 0,
+        grocery_list="grocery_list" in prompt,
+        indent=None if "minified" in system else 4,
+    )
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def create_fake_openrouter(models: ModelProfiles, default: Tuple[float, float] = (0.05, 0.0),
+                           token_latency: float = 0.0) -> FastAPI:
+    """``token_latency`` adds seconds per generated token, capped by the request's ``max_tokens``.
+
+    Non-streaming responses wait for the whole completion; streamed ones send
+    the first chunk after ``latency`` and pace the rest by ``token_latency``.
+    """
+    app = FastAPI()
+    app.state.calls = {}
+    app.state.usage = []
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "")
+        latency, error_rate = models.get(model, default)
+        app.state.calls[model] = app.state.calls.get(model, 0) + 1
+
+        content = content_for(payload)
+        completion_tokens = min(count_tokens(content), payload.get("max_tokens") or count_tokens(content))
+        content = content[:completion_tokens * 4]
+        usage = {
+            "prompt_tokens": sum(count_tokens(message["content"]) for message in payload["messages"]),
+            "completion_tokens": completion_tokens,
+        }
+        stream = bool(payload.get("stream"))
+        # Streams pay the per-token cost while sending chunks, like a real first-token/decode split
+        await asyncio.sleep(latency + (0.0 if stream else token_latency * completion_tokens))
+
+        if random.random() < error_rate:
+            return JSONResponse({"error": {"message": f"{model} is overloaded"}}, status_code=503)
+
+        app.state.usage.append(usage)
+        if not stream:
+            return {"id": "fake", "model": model, "usage": usage,
+                    "choices": [{"message": {"role": "assistant", "content": content}}]}
+
+        async def frames():
+            for start in range(0, len(content), 40):
+                if token_latency:
+                    await asyncio.sleep(token_latency * count_tokens(content[start:start + 40]))
+                chunk = {"choices": [{"delta": {"content": content[start:start + 40]}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(frames(), media_type="text/event-stream")
+
+    return app
+
+
+def parse_model_profile(value: str) -> Tuple[str, Tuple[float, float]]:
+    """Parse ``name=latency[:error_rate]``."""
+    name, _, profile = value.partition("=")
+    latency, _, error_rate = profile.partition(":")
+    return name, (float(latency or 0.05), float(error_rate or 0.0))
+
+
+def main(argv: Optional[list] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--model", action="append", default=[], metavar="NAME=LATENCY[:ERROR_RATE]")
+    parser.add_argument("--default", default="0.05", metavar="LATENCY[:ERROR_RATE]", help="profile for models not listed")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="extra seconds per generated token")
+    args = parser.parse_args(argv)
+    _, default = parse_model_profile(f"default={args.default}")
+    app = create_fake_openrouter(dict(parse_model_profile(m) for m in args.model), default=default,
+                                 token_latency=args.token_latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", ws="none")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Local stand-in for the Supabase REST (PostgREST) API.
+
+Implements just what SupabaseService uses against the schema in
+``supabase/init.sql``: the ``recipe_history`` and ``favorite_recipes``
+tables, the ``recipe_history_summary`` view and the
+``toggle_favorite_recipe`` function. Filters cover ``eq``/``lt``/``gt`` and
+the ``or``/``and`` trees used for keyset pagination; row level security is
+not modelled. Rows live in memory, indexed by user like the composite
+indexes. Run it as a server and point the backend at it:
+
+    python -m benchmarks.fake_supabase --port 9001 --latency 0.005 --seed-users 50 --seed-rows 20
+    SUPABASE_URL=http://localhost:9001 SUPABASE_KEY=bench uvicorn app.main:app
+
+or mount ``create_fake_supabase()`` in-process with ``httpx.AsyncClient(app=...)``.
+"""
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.fake_openrouter import sample_content
+
+TABLES = ("recipe_history", "favorite_recipes")
+VIEWS = {"recipe_history_summary": "recipe_history"}
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _condition(column: str, expression: str) -> Predicate:
+    """``column`` with ``op.value``, e.g. ``created_at`` and ``lt."2024-01-01"``."""
+    op, _, value = expression.partition(".")
+    if op not in _OPERATORS:
+        raise ValueError(f"Unsupported operator: {op}")
+    value = value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+    compare = _OPERATORS[op]
+    # Every column SupabaseService filters on compares correctly as text
+    return lambda row: row.get(column) is not None and compare(str(row[column]), value)
+
+
+def _logic_tree(operator: str, body: str) -> Predicate:
+    """Parse a PostgREST logic tree body like ``(a.lt.1,and(a.eq.1,b.lt.2))``."""
+    children = []
+    for part in _split_top_level(body[1:-1]):
+        head, _, rest = part.partition("(")
+        if head in ("and", "or") and rest:
+            children.append(_logic_tree(head, "(" + rest))
+        else:
+            column, _, expression = part.partition(".")
+            children.append(_condition(column, expression))
+    combine = all if operator == "and" else any
+    return lambda row: combine(child(row) for child in children)
+
+
+def _filters(params) -> List[Predicate]:
+    predicates = []
+    for key, value in params.multi_items():
+        if key in ("select", "order", "limit", "offset"):
+            continue
+        if key in ("and", "or"):
+            predicates.append(_logic_tree(key, value))
+        else:
+            predicates.append(_condition(key, value))
+    return predicates
+
+
+def _project(row: Row, select: str) -> Row:
+    if select in ("", "*"):
+        return dict(row)
+    return {column: row.get(column) for column in select.split(",")}
+
+
+def _summary(row: Row) -> Row:
+    summary = {column: row.get(column) for column in ("id", "user_id", "created_at", "ingredients", "dietary_restrictions")}
+    summary["recipe_names"] = [recipe.get("name") for recipe in row.get("recipes") or []]
+    return summary
+
+
+class FakeDatabase:
+    """In-memory tables keyed by ``user_id``, newest rows last."""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, List[Row]]] = {table: {} for table in TABLES}
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.queries = 0
+
+    def _now(self) -> str:
+        # Strictly increasing so keyset pagination over created_at is deterministic
+        self._clock = max(self._clock + timedelta(microseconds=1), datetime.now(timezone.utc))
+        return self._clock.isoformat()
+
+    def insert(self, table: str, row: Row) -> Row:
+        stored = {**row, "id": str(uuid.uuid4()), "created_at": self._now()}
+        self.tables[table].setdefault(stored["user_id"], []).append(stored)
+        return stored
+
+    def rows(self, table: str, user_id: Optional[str]) -> List[Row]:
+        if user_id is not None:
+            return self.tables[table].get(user_id, [])
+        return [row for rows in self.tables[table].values() for row in rows]
+
+    def select(self, name: str, params) -> List[Row]:
+        table = VIEWS.get(name, name)
+        user_filter = params.get("user_id", "")
+        # Use the per-user index when the query is scoped to one user
+        user_id = user_filter[len("eq."):] if user_filter.startswith("eq.") else None
+        rows = self.rows(table, user_id)
+        if name in VIEWS:
+            rows = [_summary(row) for row in rows]
+        predicates = _filters(params)
+        matched = [row for row in rows if all(predicate(row) for predicate in predicates)]
+
+        for key in reversed((params.get("order") or "").split(",")):
+            if key:
+                column, _, direction = key.partition(".")
+                matched.sort(key=lambda row: str(row.get(column)), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset") or 0)
+        limit = params.get("limit")
+        matched = matched[offset:offset + int(limit)] if limit else matched[offset:]
+        return [_project(row, params.get("select", "*")) for row in matched]
+
+    def toggle_favorite(self, p_user_id: str, p_recipe_id: str, p_recipe_name: Optional[str] = None,
+                        p_recipe_instructions: Optional[str] = None) -> Dict:
+        favorites = self.tables["favorite_recipes"].setdefault(p_user_id, [])
+        for index, row in enumerate(favorites):
+            if row["recipe_id"] == p_recipe_id:
+                del favorites[index]
+                return {"status": "removed", "recipe_id": p_recipe_id}
+        row = self.insert("favorite_recipes", {
+            "user_id": p_user_id,
+            "recipe_id": p_recipe_id,
+            "recipe_name": p_recipe_name,
+            "recipe_instructions": p_recipe_instructions,
+        })
+        return {"status": "added", "recipe": row}
+
+    def seed(self, users: int, rows_per_user: int) -> None:
+        """Fill ``recipe_history`` with ``rows_per_user`` entries for users ``user-0`` .. ``user-<users-1>``."""
+        document = json.loads(sample_content())
+        for user in range(users):
+            for n in range(rows_per_user):
+                self.insert("recipe_history", {
+                    "user_id": f"user-{user}",
+                    "ingredients": ["chicken", "rice", f"item {n}"],
+                    "dietary_restrictions": [],
+                    **document,
+                })
+
+
+def create_fake_supabase(latency: float = 0.0, seed_users: int = 0, seed_rows: int = 0) -> FastAPI:
+    """``latency`` is added to every request to stand in for the database round trip."""
+    app = FastAPI()
+    database = FakeDatabase()
+    database.seed(seed_users, seed_rows)
+    app.state.database = database
+
+    def _check(name: str) -> Optional[JSONResponse]:
+        if name not in TABLES and name not in VIEWS:
+            return JSONResponse({"code": "42P01", "message": f'relation "public.{name}" does not exist'}, status_code=404)
+        return None
+
+    @app.post("/rest/v1/rpc/toggle_favorite_recipe")
+    async def toggle_favorite_recipe(request: Request):
+        params = await request.json()
+        database.queries += 1
+        await asyncio.sleep(latency)
+        # setof jsonb: PostgREST returns the single result row in a list
+        return [database.toggle_favorite(**params)]
+
+    @app.get("/rest/v1/{name}")
+    async def select(name: str, request: Request):
+        error = _check(name)
+        if error is not None:
+            return error
+        database.queries += 1
+        await asyncio.sleep(latency)
+        try:
+            return database.select(name, request.query_params)
+        except ValueError as e:
+            return JSONResponse({"code": "PGRST100", "message": str(e)}, status_code=400)
+
+    @app.post("/rest/v1/{name}", status_code=201)
+    async def insert(name: str, request: Request):
+        if name not in TABLES:
+            return _check(name) or JSONResponse({"code": "42809", "message": f"cannot insert into {name}"}, status_code=400)
+        body = await request.json()
+        database.queries += 1
+        await asyncio.sleep(latency)
+        return [database.insert(name, row) for row in (body if isinstance(body, list) else [body])]
+
+    return app
+
+
+def main(argv: Optional[list] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every query")
+    parser.add_argument("--seed-users", type=int, default=0)
+    parser.add_argument("--seed-rows", type=int, default=0, help="history rows per seeded user")
+    args = parser.parse_args(argv)
+    app = create_fake_supabase(args.latency, args.seed_users, args.seed_rows)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", ws="none")
+
+
+if __name__ == "__main__":
+    main()
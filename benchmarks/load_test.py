@@ -0,0 +1,283 @@
+"""Offline load test for the whole service.
+
+Starts the fake OpenRouter and fake Supabase servers, starts the backend
+under uvicorn pointed at both, and drives it with a closed loop of
+``--concurrency`` clients for ``--duration`` seconds per scenario:
+
+    generate   POST /generate-recipe with a fresh pantry per request (cache misses)
+    history    GET /recipe-history/{user_id}
+    favorite   POST /favorite-recipe, toggling one of a few recipes per user
+    mixed      60% history, 25% favorite, 15% generate
+
+For each scenario it reports requests per second, p50/p95/p99 latency,
+errors and the CPU time each backend worker used (read from /proc, so Linux
+only). The load generator runs on the same machine, so leave it a core.
+
+    python -m benchmarks.load_test --workers 2 --concurrency 32 --duration 10
+    python -m benchmarks.load_test --scenario history --env USER_CACHE_ENABLED=false
+    python -m benchmarks.load_test --url http://localhost:8000 --scenario generate
+
+With ``--url`` nothing is started and CPU is not reported; the target must
+already be running (ideally against the fakes) with the seeded ``user-N`` ids.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# (method, path, json body)
+Call = Tuple[str, str, Optional[Dict]]
+
+MIXED_WEIGHTS = (("history", 0.60), ("favorite", 0.25), ("generate", 0.15))
+
+
+class Workload:
+    """Builds requests for each scenario over ``users`` seeded user ids."""
+
+    def __init__(self, users: int, pantries: int, seed: int = 0):
+        self.users = users
+        self.pantries = pantries
+        self.rng = random.Random(seed)
+        self.sent = 0
+
+    def _user(self) -> str:
+        return f"user-{self.rng.randrange(self.users)}"
+
+    def generate(self) -> Call:
+        self.sent += 1
+        # A fresh pantry per request unless --pantries limits them, so the recipe cache only hits when asked to
+        pantry = self.rng.randrange(self.pantries) if self.pantries else self.sent
+        return "POST", "/generate-recipe", {
+            "ingredients": ["chicken", "rice", f"pantry item {pantry}"],
+            "dietary_restrictions": [],
+            "user_id": self._user(),
+        }
+
+    def history(self) -> Call:
+        return "GET", f"/recipe-history/{self._user()}", None
+
+    def favorite(self) -> Call:
+        recipe = self.rng.randrange(5)
+        return "POST", "/favorite-recipe", {
+            "user_id": self._user(),
+            "recipe_id": f"recipe-{recipe}",
+            "recipe_data": {"name": f"Recipe {recipe}", "instructions": "Chop, stir and simmer."},
+        }
+
+    def mixed(self) -> Call:
+        roll = self.rng.random()
+        for name, weight in MIXED_WEIGHTS:
+            if roll < weight:
+                return getattr(self, name)()
+            roll -= weight
+        return self.history()
+
+
+SCENARIOS = ("generate", "history", "favorite", "mixed")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_load(url: str, next_call: Callable[[], Call], concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                method, path, body = next_call()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    failure = None if response.status_code < 400 else str(response.status_code)
+                except httpx.HTTPError as e:
+                    failure = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                if failure:
+                    errors[failure] = errors.get(failure, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "elapsed": elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are the 12th and 13th
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _worker_pids(root: int) -> List[int]:
+    """uvicorn's worker processes under ``root``, or ``root`` itself when it serves in-process."""
+    children = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [root]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == root and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return sorted(children) or [root]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(argv: List[str], env: Dict[str, str], port: int, timeout: float = 30.0) -> subprocess.Popen:
+    process = subprocess.Popen(argv, env={**os.environ, **env})
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(argv)} exited with {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(argv)} did not start listening on port {port}")
+
+
+def _stop(processes: List[subprocess.Popen]) -> None:
+    # Newest first, so the backend can flush queued history before the fakes go away
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def start_stack(args) -> Tuple[str, List[subprocess.Popen], subprocess.Popen]:
+    """Start both fakes and the backend. Returns the backend URL, all processes and the backend process."""
+    upstream_port, database_port, backend_port = _free_port(), _free_port(), _free_port()
+    processes = []
+    try:
+        processes.append(_start([
+            sys.executable, "-m", "benchmarks.fake_openrouter", "--port", str(upstream_port),
+            "--default", f"{args.upstream_latency}:{args.upstream_error_rate}",
+            "--token-latency", str(args.token_latency),
+        ], {}, upstream_port))
+        processes.append(_start([
+            sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(database_port),
+            "--latency", str(args.db_latency), "--seed-users", str(args.users), "--seed-rows", str(args.seed_rows),
+        ], {}, database_port))
+
+        env = {
+            "OPENROUTER_API_KEY": "bench",
+            "OPENROUTER_API_URL": f"http://127.0.0.1:{upstream_port}/api/v1/chat/completions",
+            "SUPABASE_URL": f"http://127.0.0.1:{database_port}",
+            "SUPABASE_KEY": "bench",
+            "LOG_LEVEL": "WARNING",
+            # What the app reads to know it shares state with other workers
+            "WEB_CONCURRENCY": str(args.workers),
+        }
+        env.update(dict(item.split("=", 1) for item in args.env))
+        backend = _start([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(backend_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log", "--ws", "none",
+        ], env, backend_port)
+        processes.append(backend)
+    except Exception:
+        _stop(processes)
+        raise
+    return f"http://127.0.0.1:{backend_port}", processes, backend
+
+
+def _format_errors(errors: Dict[str, int]) -> str:
+    return ",".join(f"{kind}x{count}" for kind, count in sorted(errors.items())) or "-"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable; default runs all")
+    parser.add_argument("--url", help="target an already running backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of unmeasured load before each scenario")
+    parser.add_argument("--users", type=int, default=100, help="distinct user ids")
+    parser.add_argument("--seed-rows", type=int, default=20, help="history rows per user in the fake database")
+    parser.add_argument("--pantries", type=int, default=0, help="distinct pantries to generate (0: every request unique)")
+    parser.add_argument("--upstream-latency", type=float, default=0.3, help="fake OpenRouter base latency in seconds")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake OpenRouter seconds per generated token")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="fake Supabase seconds per query")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra backend environment")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    backend: Optional[subprocess.Popen] = None
+    url = args.url
+    if url is None:
+        url, processes, backend = start_stack(args)
+
+    try:
+        workers = _worker_pids(backend.pid) if backend is not None else []
+        print(f"target {url}, {len(workers) or '?'} worker(s), concurrency {args.concurrency}, {args.duration:.0f}s per scenario")
+        print(f"{'scenario':10} {'requests':>9} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/req':>11}  errors")
+        for scenario in args.scenario or SCENARIOS:
+            workload = Workload(args.users, args.pantries)
+            next_call = getattr(workload, scenario)
+            if args.warmup:
+                asyncio.run(run_load(url, next_call, args.concurrency, args.warmup))
+
+            before = {pid: _cpu_seconds(pid) for pid in workers}
+            result = asyncio.run(run_load(url, next_call, args.concurrency, args.duration))
+            after = {pid: _cpu_seconds(pid) for pid in workers}
+            used = {pid: after[pid] - before[pid] for pid in workers
+                    if before[pid] is not None and after[pid] is not None}
+
+            cpu_per_request = f"{sum(used.values()) / max(result['requests'], 1) * 1000:11.2f}" if used else f"{'n/a':>11}"
+            print(f"{scenario:10} {result['requests']:9d} {result['rps']:9.1f} {result['p50']:9.1f} {result['p95']:9.1f} "
+                  f"{result['p99']:9.1f} {cpu_per_request}  {_format_errors(result['errors'])}")
+            for pid, seconds in used.items():
+                print(f"{'':10}   worker {pid}: {seconds:.2f}s cpu ({seconds / result['elapsed'] * 100:.0f}% of a core)")
+    finally:
+        _stop(processes)
+
+
+if __name__ == "__main__":
+    main()
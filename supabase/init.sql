@@ -13,8 +13,22 @@ create table recipe_history (
     created_at timestamp with time zone default timezone('utc'::text, now())
 );
 
--- Create index on user_id for faster queries
-create index recipe_history_user_id_idx on recipe_history(user_id);
+-- Composite index backing per-user keyset pagination on (created_at, id)
+create index recipe_history_user_created_idx on recipe_history(user_id, created_at desc, id desc);
+
+-- Lightweight projection for history list views (recipe names only)
+create view recipe_history_summary with (security_invoker = true) as
+select
+    id,
+    user_id,
+    created_at,
+    ingredients,
+    dietary_restrictions,
+    coalesce(
+        (select jsonb_agg(recipe->'name') from jsonb_array_elements(recipes) as recipe),
+        '[]'::jsonb
+    ) as recipe_names
+from recipe_history;
 
 -- Favorite Recipes table
 create table favorite_recipes (
@@ -27,8 +41,47 @@ create table favorite_recipes (
     unique(user_id, recipe_id)
 );
 
--- Create index on user_id for faster queries
-create index favorite_recipes_user_id_idx on favorite_recipes(user_id);
+-- Composite index backing per-user keyset pagination on (created_at, id)
+create index favorite_recipes_user_created_idx on favorite_recipes(user_id, created_at desc, id desc);
+
+-- Toggle a favorite in one round trip. Returns one row with the resulting state,
+-- {"status": "removed", "recipe_id": ...} or {"status": "added", "recipe": {...}};
+-- a set keeps the PostgREST response a plain list of rows.
+-- Runs with the caller's privileges so the RLS policies below still apply.
+create or replace function toggle_favorite_recipe(
+    p_user_id text,
+    p_recipe_id text,
+    p_recipe_name text,
+    p_recipe_instructions text
+) returns setof jsonb
+language plpgsql
+security invoker
+as $$
+declare
+    v_row favorite_recipes;
+begin
+    delete from favorite_recipes
+    where user_id = p_user_id and recipe_id = p_recipe_id;
+
+    if found then
+        return next jsonb_build_object('status', 'removed', 'recipe_id', p_recipe_id);
+        return;
+    end if;
+
+    insert into favorite_recipes (user_id, recipe_id, recipe_name, recipe_instructions)
+    values (p_user_id, p_recipe_id, p_recipe_name, p_recipe_instructions)
+    on conflict (user_id, recipe_id) do nothing
+    returning * into v_row;
+
+    -- A concurrent toggle inserted the same favorite first; report it as added
+    if v_row.id is null then
+        select * into v_row from favorite_recipes
+        where user_id = p_user_id and recipe_id = p_recipe_id;
+    end if;
+
+    return next jsonb_build_object('status', 'added', 'recipe', to_jsonb(v_row));
+end;
+$$;
 
 -- Enable Row Level Security (RLS)
 alter table recipe_history enable row level security;
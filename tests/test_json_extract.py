@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from app.services.json_extract import extract_json_object, loads, parse_recipe_response
+from app.services.json_stream import IncrementalJSONScanner
+
+DAYS = ["Monday", "Tuesday", "Wednesday"]
+
+
+def _document(recipes: int = 3) -> dict:
+    return {
+        "recipes": [{"name": f"Recipe {i}", "instructions": f"Step 1: chop {{gently}}. Step 2: simmer {i}."}
+                    for i in range(recipes)],
+        "meal_plan": {day: f"Recipe {i}" for i, day in enumerate(DAYS)},
+        "grocery_list": [f"item {i}" for i in range(5)],
+    }
+
+
+CLEAN = json.dumps(_document(), indent=2)
+TRAILING = CLEAN.replace('"\n    }', '",\n    }').replace('}\n  ],', '},\n  ],').replace('"item 4"', '"item 4",')
+
+
+@pytest.mark.parametrize("content", [
+    CLEAN,
+    f"```json\n{CLEAN}\n```",
+    f"```\n{CLEAN}\n```",
+    f"Sure! Here are some recipes:\n\n{CLEAN}\n\nEnjoy! Ask me for more {{ideas}}.",
+    TRAILING,
+    f"```json\n{TRAILING}\n```\nHope this helps!",
+], ids=["clean", "fenced", "fenced without language", "preamble and epilogue", "trailing commas",
+        "fenced, trailing commas and epilogue"])
+def test_recovers_the_whole_document(content):
+    assert parse_recipe_response(content) == _document()
+
+
+def test_raw_newlines_in_strings():
+    result = parse_recipe_response(CLEAN.replace("Step 2:", "\nStep 2:"))
+    assert result["recipes"][1]["instructions"] == "Step 1: chop {gently}. \nStep 2: simmer 1."
+
+
+def test_truncated_inside_a_string_keeps_complete_elements():
+    content = CLEAN[:CLEAN.index('"item 3"') + 4]
+    assert parse_recipe_response(content)["grocery_list"] == ["item 0", "item 1", "item 2"]
+
+
+def test_truncated_after_a_complete_element():
+    content = CLEAN[:CLEAN.index('"item 3"') + len('"item 3"')]
+    assert parse_recipe_response(content)["grocery_list"] == ["item 0", "item 1", "item 2", "item 3"]
+
+
+def test_truncated_recipe_is_dropped():
+    content = CLEAN[:CLEAN.index('"Step 1: chop {gently}. Step 2: simmer 2."') + 10]
+    result = parse_recipe_response(content, sections=["recipes"])
+    assert [recipe["name"] for recipe in result["recipes"]] == ["Recipe 0", "Recipe 1"]
+    assert result["meal_plan"] == {} and result["grocery_list"] == []
+
+
+def test_missing_requested_section():
+    with pytest.raises(ValueError, match="grocery_list"):
+        parse_recipe_response(json.dumps({"recipes": _document()["recipes"], "meal_plan": {}}))
+
+
+def test_empty_object_is_rejected():
+    with pytest.raises(ValueError):
+        parse_recipe_response("{}")
+
+
+def test_no_complete_recipe_is_rejected():
+    with pytest.raises(ValueError, match="no complete recipe"):
+        parse_recipe_response(json.dumps({"recipes": [{"name": "Cut off"}]}), sections=["recipes"])
+
+
+def test_unrequested_sections_may_be_absent():
+    result = parse_recipe_response(json.dumps({"grocery_list": ["rice"]}), sections=["grocery_list"])
+    assert result == {"recipes": [], "meal_plan": {}, "grocery_list": ["rice"]}
+
+
+def test_no_object():
+    with pytest.raises(ValueError):
+        extract_json_object("I can't help with that.")
+
+
+def test_mismatched_brackets():
+    with pytest.raises(ValueError):
+        extract_json_object('{"recipes": [}')
+
+
+def test_loads_accepts_control_characters():
+    assert loads('{"a": "line\nbreak"}') == {"a": "line\nbreak"}
+
+
+def _stream(content: str, chunk_size: int = 7):
+    scanner = IncrementalJSONScanner()
+    events = []
+    for start in range(0, len(content), chunk_size):
+        events.extend(scanner.feed(content[start:start + chunk_size]))
+    return scanner, events
+
+
+def test_stream_emits_recipes_with_raw_newlines():
+    _, events = _stream(CLEAN.replace("Step 2:", "\nStep 2:"))
+    recipes = [value for kind, key, value in events if kind == "element" and key == "recipes"]
+    assert [recipe["instructions"] for recipe in recipes] == [
+        f"Step 1: chop {{gently}}. \nStep 2: simmer {i}." for i in range(3)
+    ]
+
+
+def test_stream_final_parse_repairs_like_the_plain_path():
+    content = f"```json\n{TRAILING}\n```"
+    scanner, _ = _stream(content)
+    assert parse_recipe_response(scanner.text) == parse_recipe_response(content) == _document()